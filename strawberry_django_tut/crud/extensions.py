@@ -0,0 +1,99 @@
+import functools
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+from django.conf import settings
+from strawberry.extensions import SchemaExtension
+
+# Distinct operations kept per worker, parsed documents and validation results
+DOCUMENT_CACHE_SIZE = getattr(settings, 'GRAPHQL_DOCUMENT_CACHE_SIZE', 256)
+
+
+class DocumentCacheStore:
+    """Bounded LRU of parsed documents and validation results, with hit/miss counters."""
+
+    def __init__(self, max_size: int) -> None:
+        self.max_size = max_size
+        self._entries: 'OrderedDict[Hashable, Any]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = {'parse': 0, 'validate': 0}
+        self.misses = {'parse': 0, 'validate': 0}
+
+    def get(self, step: str, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            value = self._entries.get((step, key))
+            if value is None:
+                self.misses[step] += 1
+                return None
+            self._entries.move_to_end((step, key))
+            self.hits[step] += 1
+            return value
+
+    def set(self, step: str, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._entries[(step, key)] = value
+            self._entries.move_to_end((step, key))
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {'hits': dict(self.hits), 'misses': dict(self.misses), 'size': len(self._entries)}
+
+
+document_cache = DocumentCacheStore(DOCUMENT_CACHE_SIZE)
+
+
+@functools.lru_cache(maxsize=None)
+def _schema_version(schema) -> str:
+    """Hash of the schema SDL, so a deploy that changes the schema never reuses old validation results."""
+    return hashlib.sha256(str(schema).encode()).hexdigest()
+
+
+class DocumentCache(SchemaExtension):
+    """Skip parsing and validation of documents already seen, keyed by document hash and schema version.
+
+    Usage: strawberry.Schema(query=Query, mutation=Mutation, extensions=[DocumentCache])
+    """
+
+    store = document_cache
+
+    def _document_key(self):
+        execution_context = self.execution_context
+        document_hash = hashlib.sha256(execution_context.query.encode()).hexdigest()
+        return _schema_version(execution_context.schema), document_hash
+
+    def on_parse(self):
+        execution_context = self.execution_context
+        if not execution_context.query:
+            yield
+            return
+        self.key = self._document_key()
+        document = self.store.get('parse', self.key)
+        if document is not None:
+            execution_context.graphql_document = document
+            yield
+            return
+        yield
+        # Syntax errors raise before reaching here, only valid documents are stored
+        if execution_context.graphql_document is not None:
+            self.store.set('parse', self.key, execution_context.graphql_document)
+
+    def on_validate(self):
+        execution_context = self.execution_context
+        key = getattr(self, 'key', None)
+        if key is None:
+            yield
+            return
+        # Extensions may add validation rules, results are only shared between identical rule sets
+        key = key + (tuple(execution_context.validation_rules),)
+        errors = self.store.get('validate', key)
+        if errors is not None:
+            # An empty list (not None) tells strawberry the document is already validated
+            execution_context.errors = list(errors)
+            yield
+            return
+        yield
+        self.store.set('validate', key, list(execution_context.errors or []))
@@ -1,16 +1,17 @@
+import asyncio
 import datetime
-from typing import List, Optional
+from typing import AsyncGenerator, List, Optional
 
 import strawberry
 import strawberry_django
+from django.db.models.signals import post_save
 from strawberry import auto
 
+from .extensions import DocumentCache
 from .models import Book
 
 from dataclasses import asdict
 
-from asgiref.sync import sync_to_async
-
 @strawberry.input
 class BookInput:
     title: str
@@ -35,8 +36,8 @@ class Query:
     books: List[BookType] = strawberry_django.field()
 
     @strawberry.field
-    def all_books(self) -> List[BookType]:
-        return Book.objects.all()
+    async def all_books(self) -> List[BookType]:
+        return [book async for book in Book.objects.all()]
 
 
 @strawberry.type
@@ -47,27 +48,58 @@ class Mutation:
     async def update_book(self, book_id: int, data: BookUpdateInput) -> BookType:
         try:
 
-            book = await sync_to_async(Book.objects.get)(id=book_id)
+            book = await Book.objects.aget(id=book_id)
 
             for key, value in asdict(data).items():
                 if value is not None:
                     setattr(book, key, value)
 
-            await sync_to_async(book.save)()
+            await book.asave()
 
             return book
         except Book.DoesNotExist:
-            raise strawberry('Not found')
+            raise Exception('Not found')
         
     @strawberry.mutation
     async def delete_book(self, book_id: int) -> bool:
         try:
 
-            book = await sync_to_async(Book.objects.get)(pk=book_id)
-            await sync_to_async(book.delete)()
+            book = await Book.objects.aget(pk=book_id)
+            await book.adelete()
 
             return True
         except Book.DoesNotExist:
-            raise strawberry('Not found')
+            raise Exception('Not found')
+
+# (event loop, queue) of every bookAdded subscriber of this process
+book_subscribers = set()
+
+
+def _publish_book(sender, instance, created, **kwargs):
+    if created:
+        for loop, queue in list(book_subscribers):
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, instance)
+            except RuntimeError:
+                # The subscriber loop is closed, its generator cleans up on its own
+                pass
+
+
+post_save.connect(_publish_book, sender=Book, dispatch_uid='crud_publish_book')
+
+
+@strawberry.type
+class Subscription:
+    @strawberry.subscription
+    async def book_added(self) -> AsyncGenerator[BookType, None]:
+        """Get every Book created from now on by this server process."""
+        subscriber = (asyncio.get_running_loop(), asyncio.Queue())
+        book_subscribers.add(subscriber)
+        try:
+            while True:
+                yield await subscriber[1].get()
+        finally:
+            book_subscribers.discard(subscriber)
+
 
-schema = strawberry.Schema(query=Query, mutation=Mutation)
\ No newline at end of file
+schema = strawberry.Schema(query=Query, mutation=Mutation, subscription=Subscription, extensions=[DocumentCache])
\ No newline at end of file
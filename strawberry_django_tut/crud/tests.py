@@ -1,3 +1,100 @@
+import asyncio
+import hashlib
+import json
+from unittest import mock
+
 from django.test import TestCase
 
-# Create your tests here.
+from .extensions import DocumentCache, DocumentCacheStore
+from .models import Book
+from .schema import book_subscribers, schema
+from .views import PersistedQueryGraphQLView, PersistedQueryStore
+
+QUERY = '{ __typename }'
+QUERY_HASH = hashlib.sha256(QUERY.encode()).hexdigest()
+
+
+class PersistedQueryTests(TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(PersistedQueryGraphQLView, 'store', PersistedQueryStore(10))
+        self.store = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def post(self, payload):
+        response = self.client.post('/graphql/', json.dumps(payload), content_type='application/json')
+        return response.json()
+
+    def persisted_query(self, sha256_hash=QUERY_HASH):
+        return {'persistedQuery': {'version': 1, 'sha256Hash': sha256_hash}}
+
+    def test_unknown_hash_asks_for_the_query(self):
+        result = self.post({'extensions': self.persisted_query()})
+        self.assertEqual(result['errors'][0]['extensions']['code'], 'PERSISTED_QUERY_NOT_FOUND')
+        self.assertIsNone(self.store.get(QUERY_HASH))
+
+    def test_query_is_registered_and_served_by_hash(self):
+        result = self.post({'query': QUERY, 'extensions': self.persisted_query()})
+        self.assertEqual(result['data'], {'__typename': 'Query'})
+        self.assertEqual(self.store.get(QUERY_HASH), QUERY)
+
+        result = self.post({'extensions': self.persisted_query()})
+        self.assertEqual(result['data'], {'__typename': 'Query'})
+
+    def test_hash_by_get(self):
+        self.store.set(QUERY_HASH, QUERY)
+        response = self.client.get('/graphql/', {'extensions': json.dumps(self.persisted_query())},
+                                   HTTP_ACCEPT='application/json')
+        self.assertEqual(response.json()['data'], {'__typename': 'Query'})
+
+    def test_hash_mismatch_is_rejected(self):
+        result = self.post({'query': QUERY, 'extensions': self.persisted_query('0' * 64)})
+        self.assertEqual(result['errors'][0]['extensions']['code'], 'INTERNAL_SERVER_ERROR')
+        self.assertIsNone(self.store.get('0' * 64))
+
+    def test_unsupported_version(self):
+        result = self.post({'extensions': {'persistedQuery': {'version': 2, 'sha256Hash': QUERY_HASH}}})
+        self.assertEqual(result['errors'][0]['extensions']['code'], 'PERSISTED_QUERY_NOT_SUPPORTED')
+
+
+class DocumentCacheTests(TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(DocumentCache, 'store', DocumentCacheStore(10))
+        self.store = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_repeated_document_skips_parse_and_validation(self):
+        for _ in range(3):
+            result = schema.execute_sync(QUERY)
+            self.assertIsNone(result.errors)
+            self.assertEqual(result.data, {'__typename': 'Query'})
+        stats = self.store.stats()
+        self.assertEqual(stats['misses'], {'parse': 1, 'validate': 1})
+        self.assertEqual(stats['hits'], {'parse': 2, 'validate': 2})
+
+    def test_validation_errors_are_cached(self):
+        for _ in range(2):
+            result = schema.execute_sync('{ missingField }')
+            self.assertEqual(len(result.errors), 1)
+        self.assertEqual(self.store.stats()['hits']['validate'], 1)
+
+    def test_syntax_error_is_not_cached(self):
+        for _ in range(2):
+            result = schema.execute_sync('{ allBooks { title }')
+            self.assertEqual(len(result.errors), 1)
+        stats = self.store.stats()
+        self.assertEqual(stats['size'], 0)
+        self.assertEqual(stats['hits'], {'parse': 0, 'validate': 0})
+
+
+class SubscriptionTests(TestCase):
+    async def test_book_added(self):
+        self.addCleanup(book_subscribers.clear)
+        # subscribe() only returns once the first event arrives
+        subscribing = asyncio.ensure_future(schema.subscribe('subscription { bookAdded { title } }'))
+        while not book_subscribers:
+            await asyncio.sleep(0.01)
+        await Book.objects.acreate(title='Dune', author='Frank Herbert', published_date='1965-08-01')
+        subscription = await asyncio.wait_for(subscribing, 5)
+        result = await asyncio.wait_for(subscription.__anext__(), 5)
+        self.assertEqual(result.data, {'bookAdded': {'title': 'Dune'}})
+        await subscription.aclose()
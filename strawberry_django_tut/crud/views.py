@@ -1,3 +1,94 @@
-from django.shortcuts import render
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
 
-# Create your views here.
+from django.conf import settings
+from graphql import GraphQLError
+from strawberry.django.views import AsyncGraphQLView
+from strawberry.types import ExecutionResult
+
+# Documents kept by the persisted query store of each worker
+PERSISTED_QUERIES_SIZE = getattr(settings, 'GRAPHQL_PERSISTED_QUERIES_SIZE', 1000)
+
+
+class PersistedQueryError(Exception):
+    """Error answered to the client as a GraphQL error carrying an APQ code."""
+
+    def __init__(self, message: str, code: str) -> None:
+        super().__init__(message)
+        self.message = message
+        self.code = code
+
+
+class PersistedQueryStore:
+    """Bounded LRU of query documents by SHA-256 hash."""
+
+    def __init__(self, max_size: int) -> None:
+        self.max_size = max_size
+        self._documents: 'OrderedDict[str, str]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, sha256_hash: str) -> Optional[str]:
+        with self._lock:
+            document = self._documents.get(sha256_hash)
+            if document is not None:
+                self._documents.move_to_end(sha256_hash)
+            return document
+
+    def set(self, sha256_hash: str, document: str) -> None:
+        with self._lock:
+            self._documents[sha256_hash] = document
+            self._documents.move_to_end(sha256_hash)
+            while len(self._documents) > self.max_size:
+                self._documents.popitem(last=False)
+
+
+persisted_queries = PersistedQueryStore(PERSISTED_QUERIES_SIZE)
+
+
+class PersistedQueryGraphQLView(AsyncGraphQLView):
+    """AsyncGraphQLView with automatic persisted queries (the Apollo APQ protocol).
+
+    Clients send extensions.persistedQuery.sha256Hash instead of the document. Unknown hashes get a
+    PersistedQueryNotFound error and the client retries once with the full text, which is then stored.
+    """
+
+    store = persisted_queries
+
+    def _resolve_persisted_query(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        extensions = data.get('extensions') or {}
+        if isinstance(extensions, str):
+            # GET requests send extensions as a JSON query parameter
+            extensions = json.loads(extensions)
+        persisted_query = extensions.get('persistedQuery')
+        if not persisted_query:
+            return data
+        if persisted_query.get('version') != 1:
+            raise PersistedQueryError('Unsupported persisted query version', 'PERSISTED_QUERY_NOT_SUPPORTED')
+        sha256_hash = persisted_query.get('sha256Hash')
+        query = data.get('query')
+        if query is None:
+            query = self.store.get(sha256_hash)
+            if query is None:
+                raise PersistedQueryError('PersistedQueryNotFound', 'PERSISTED_QUERY_NOT_FOUND')
+            return {**data, 'query': query}
+        if hashlib.sha256(query.encode()).hexdigest() != sha256_hash:
+            raise PersistedQueryError('provided sha does not match query', 'INTERNAL_SERVER_ERROR')
+        self.store.set(sha256_hash, query)
+        return data
+
+    def parse_query_params(self, params):
+        return self._resolve_persisted_query(super().parse_query_params(params))
+
+    def parse_json(self, data):
+        parsed = super().parse_json(data)
+        # Batched or multipart payloads are left alone
+        return self._resolve_persisted_query(parsed) if isinstance(parsed, dict) else parsed
+
+    async def execute_operation(self, request, context, root_value):
+        try:
+            return await super().execute_operation(request, context, root_value)
+        except PersistedQueryError as e:
+            return ExecutionResult(data=None, errors=[GraphQLError(e.message, extensions={'code': e.code})])
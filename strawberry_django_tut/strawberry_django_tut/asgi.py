@@ -13,4 +13,23 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'strawberry_django_tut.settings')
 
-application = get_asgi_application()
+# Load Django before importing anything that touches the models
+django_asgi_app = get_asgi_application()
+
+from channels.auth import AuthMiddlewareStack  # noqa: E402
+from channels.routing import ProtocolTypeRouter, URLRouter  # noqa: E402
+from channels.security.websocket import AllowedHostsOriginValidator  # noqa: E402
+from django.urls import re_path  # noqa: E402
+from strawberry.channels import GraphQLWSConsumer  # noqa: E402
+
+from crud.schema import schema  # noqa: E402
+
+# HTTP goes through Django as before, subscriptions through WebSocket (graphql-transport-ws and graphql-ws).
+# Browsers send cookies on cross-site WebSocket handshakes, so only origins in ALLOWED_HOSTS may connect, and
+# the session user is available to resolvers as info.context['request'].scope['user']
+application = ProtocolTypeRouter({
+    'http': django_asgi_app,
+    'websocket': AllowedHostsOriginValidator(AuthMiddlewareStack(URLRouter([
+        re_path(r'^graphql/?$', GraphQLWSConsumer.as_asgi(schema=schema)),
+    ]))),
+})
@@ -19,12 +19,14 @@ from django.urls import path
 from django.views.decorators.csrf import csrf_exempt
 
 from strawberry.django.views import GraphQLView
-from strawberry.django.views import AsyncGraphQLView
 
 from crud.schema import schema
+from crud.views import PersistedQueryGraphQLView
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     # path('', include('book.urls')),
-    path('graphql/', csrf_exempt(AsyncGraphQLView.as_view(schema=schema)))
+    # Streaming exports of the test app, once it is in INSTALLED_APPS, see test/urls.py
+    # path('', include('test.urls')),
+    path('graphql/', csrf_exempt(PersistedQueryGraphQLView.as_view(schema=schema)))
 ]
@@ -0,0 +1,219 @@
+import atexit
+import fcntl
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Any, Callable, Dict, List
+
+from django.conf import settings
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+# Buffer audit rows and write them in batches instead of one INSERT and commit per mutation
+WRITE_BEHIND_ENABLED = getattr(settings, "GRAPHQL_BITACORA_WRITE_BEHIND", False)
+# Rows pending in memory before producers have to wait
+WRITE_BEHIND_MAX_SIZE = getattr(settings, "GRAPHQL_BITACORA_WRITE_BEHIND_MAX_SIZE", 10000)
+# Rows that trigger a flush without waiting for the interval
+WRITE_BEHIND_BATCH_SIZE = getattr(settings, "GRAPHQL_BITACORA_WRITE_BEHIND_BATCH_SIZE", 500)
+# Longest seconds a row waits in memory
+WRITE_BEHIND_INTERVAL = getattr(settings, "GRAPHQL_BITACORA_WRITE_BEHIND_INTERVAL", 1.0)
+# Seconds a producer waits for room in a full buffer before writing the rows itself
+WRITE_BEHIND_BLOCK_TIMEOUT = getattr(settings, "GRAPHQL_BITACORA_WRITE_BEHIND_BLOCK_TIMEOUT", 5.0)
+# Directory of the spill files, one per worker, replayed by the next worker that queues a row
+WRITE_BEHIND_SPILL_DIR = getattr(
+    settings, "GRAPHQL_BITACORA_WRITE_BEHIND_SPILL_DIR", os.path.join(tempfile.gettempdir(), "graphql-bitacora-spill")
+)
+# fsync the spill file on every append, without it queued rows survive a worker crash but not a host crash
+WRITE_BEHIND_FSYNC = getattr(settings, "GRAPHQL_BITACORA_WRITE_BEHIND_FSYNC", True)
+
+
+class WriteBehindBuffer:
+    """Bounded in-memory buffer of rows written in batches by a background thread.
+
+    Every pending row is also appended to a spill file, fsynced when fsync is set, so rows survive a crash: the
+    next worker that queues a row adopts the spill files no live worker holds a lock on and writes their rows.
+    Delivery is at least once, a crash between a batch commit and the spill file rewrite replays that batch.
+
+    Nothing touches the disk or starts a thread until the first row is queued.
+    """
+
+    def __init__(
+        self,
+        write: Callable[[List[Dict[str, Any]]], Any],
+        spill_dir: str,
+        max_size: int,
+        batch_size: int,
+        interval: float,
+        block_timeout: float,
+        fsync: bool = True,
+    ) -> None:
+        self.write = write
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.interval = interval
+        self.block_timeout = block_timeout
+        self.fsync = fsync
+        self.spill_dir = spill_dir
+        self.spill_path = None
+        self._spill = None
+        self._pending: deque = deque()
+        self._condition = threading.Condition()
+        self._spill_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._started = False
+
+    def _start(self) -> None:
+        """Open the spill file, replay orphaned ones and start the writer thread, once per process."""
+        with self._start_lock:
+            if self._started:
+                return
+            os.makedirs(self.spill_dir, exist_ok=True)
+            self.spill_path = os.path.join(self.spill_dir, f"{os.getpid()}-{uuid.uuid4().hex}.ndjson")
+            self._spill = self._open_spill()
+            self._started = True
+            self._adopt_spill_files()
+            threading.Thread(target=self._run, name="bitacora-write-behind", daemon=True).start()
+            atexit.register(self.flush)
+
+    def _open_spill(self):
+        spill = open(self.spill_path, "a", encoding="utf-8")
+        # Held while the worker lives, tells other workers this file is not orphaned
+        fcntl.flock(spill, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return spill
+
+    def _adopt_spill_files(self) -> None:
+        """Queue the rows left in the spill files of workers that are gone."""
+        names = os.listdir(self.spill_dir)
+        for name in names:
+            path = os.path.join(self.spill_dir, name)
+            if path != self.spill_path and name.endswith(".ndjson"):
+                self._adopt_spill_file(path)
+        for name in names:
+            path = os.path.join(self.spill_dir, name)
+            # Rewrite of a worker that died before replacing its spill file, whose rows that file still has. A
+            # live worker always has its spill file, an orphaned one is gone once adopted
+            if name.endswith(".ndjson.tmp") and not os.path.exists(path[: -len(".tmp")]):
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+
+    def _adopt_spill_file(self, path: str) -> None:
+        try:
+            orphan = open(path, encoding="utf-8")
+        except FileNotFoundError:
+            # Already adopted by another worker
+            return
+        with orphan:
+            try:
+                fcntl.flock(orphan, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                # A live worker owns it
+                return
+            try:
+                adopted = os.stat(path).st_ino != os.fstat(orphan.fileno()).st_ino
+            except FileNotFoundError:
+                adopted = True
+            if adopted:
+                # Unlinked by the worker that adopted it, or replaced by its owner's rewrite, while we opened it
+                return
+            rows = [json.loads(line) for line in orphan if line.strip()]
+            if rows:
+                logger.warning("Replaying %s buffered Bitacora rows from %s", len(rows), path)
+                self._append(rows)
+            # Still holding the lock, no other worker can adopt these rows again in between
+            os.unlink(path)
+
+    def _append(self, rows: List[Dict[str, Any]]) -> None:
+        with self._spill_lock:
+            self._spill.write("".join(json.dumps(row, default=str) + "\n" for row in rows))
+            self._spill.flush()
+            if self.fsync:
+                os.fsync(self._spill.fileno())
+            # Still holding the spill lock, a rewrite never sees the row in the file but not in memory
+            with self._condition:
+                self._pending.extend(rows)
+                self._condition.notify_all()
+
+    def put(self, row: Dict[str, Any]) -> None:
+        """Queue a row, waiting for room while the buffer is full (backpressure)."""
+        if not self._started:
+            self._start()
+        with self._condition:
+            has_room = self._condition.wait_for(lambda: len(self._pending) < self.max_size, self.block_timeout)
+        if not has_room:
+            # The writer can't keep up, this producer writes the pending rows itself instead of losing its own
+            logger.warning("Bitacora write-behind buffer full, flushing in the request")
+            self.flush()
+        self._append([row])
+
+    def _take(self, wait: bool) -> List[Dict[str, Any]]:
+        with self._condition:
+            if wait:
+                self._condition.wait_for(lambda: len(self._pending) >= self.batch_size, self.interval)
+            batch = [self._pending.popleft() for _ in range(min(self.batch_size, len(self._pending)))]
+            # Producers blocked on a full buffer can go on
+            self._condition.notify_all()
+            return batch
+
+    def _write_batch(self, batch: List[Dict[str, Any]]) -> None:
+        try:
+            self.write(batch)
+        except Exception:
+            logger.exception("Bitacora write-behind flush failed, retrying")
+            with self._condition:
+                self._pending.extendleft(reversed(batch))
+            raise
+        finally:
+            close_old_connections()
+        self._rewrite_spill()
+
+    def _rewrite_spill(self) -> None:
+        """Shrink the spill file to the rows still pending."""
+        with self._spill_lock, self._condition:
+            pending = list(self._pending)
+            tmp_path = f"{self.spill_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as tmp:
+                tmp.write("".join(json.dumps(row, default=str) + "\n" for row in pending))
+                if self.fsync:
+                    tmp.flush()
+                    os.fsync(tmp.fileno())
+            spill = open(tmp_path, "a", encoding="utf-8")
+            fcntl.flock(spill, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            os.replace(tmp_path, self.spill_path)
+            if self.fsync:
+                self._fsync_dir()
+            self._spill.close()
+            self._spill = spill
+
+    def _fsync_dir(self) -> None:
+        """Make the replace of the spill file durable."""
+        fd = os.open(self.spill_dir, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def flush(self) -> None:
+        """Write every pending row now."""
+        while True:
+            batch = self._take(wait=False)
+            if not batch:
+                return
+            self._write_batch(batch)
+
+    def _run(self) -> None:
+        while True:
+            batch = self._take(wait=True)
+            if not batch:
+                continue
+            try:
+                self._write_batch(batch)
+            except Exception:
+                time.sleep(self.interval)
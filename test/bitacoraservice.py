@@ -1,46 +1,155 @@
 import datetime
-from typing import List
+from typing import Any, Dict, List, Optional, Tuple
 
+from django.db import connections, router, transaction
+
+from ..audit import (
+    WRITE_BEHIND_BATCH_SIZE,
+    WRITE_BEHIND_BLOCK_TIMEOUT,
+    WRITE_BEHIND_ENABLED,
+    WRITE_BEHIND_FSYNC,
+    WRITE_BEHIND_INTERVAL,
+    WRITE_BEHIND_MAX_SIZE,
+    WRITE_BEHIND_SPILL_DIR,
+    WriteBehindBuffer,
+)
+from ..broadcast import broadcaster
+from ..filters import compile_filter
 from ..models import Bitacora
+from ..pagination import decode_cursor, keyset_filter, keyset_order
+from ..search import search_bitacora
 from ..types import BitacoraCreateInput, BitacoraFilterInput, BitacoraUpdateInput
 
+# Keyset ordering used by cursor pagination, bit_id breaks ties between rows of the same second
+BITACORA_KEYSET = ("bit_fechaope", "bit_horaope", "bit_id")
+# Filter fields matched by something other than equality
+BITACORA_LOOKUPS = {"bit_observaciones": "icontains"}
+# Rows per INSERT statement in batch creation, the backend may lower it to fit its parameter limit
+BITACORA_BATCH_SIZE = 1000
+# Broadcast channel of the bitacoraCreated subscription
+BITACORA_CREATED = "bitacora_created"
+
+
+def bitacora_message(bitacora: Bitacora) -> Dict[str, Any]:
+    """Column values of a Bitacora, the payload broadcast to subscribers."""
+    return {field.attname: field.value_from_object(bitacora) for field in Bitacora._meta.concrete_fields}
+
+
+def bitacora_from_message(message: Dict[str, Any]) -> Bitacora:
+    """Rebuild a Bitacora from a broadcast payload, values may have gone through JSON."""
+    return Bitacora(
+        **{field.attname: field.to_python(message[field.attname]) for field in Bitacora._meta.concrete_fields}
+    )
+
+
+def _publish_created(bitacoras: List[Bitacora]) -> None:
+    """Announce new rows to bitacoraCreated subscribers once they are committed."""
+    messages = [bitacora_message(bitacora) for bitacora in bitacoras]
+    transaction.on_commit(lambda: [broadcaster.publish(BITACORA_CREATED, message) for message in messages])
+
+
+def _insert_bitacoras(bitacoras: List[Bitacora]) -> List[Bitacora]:
+    """Insert rows with a few multi-row INSERTs, must run in a transaction.
+
+    Backends that can't return the new ids from a bulk insert (MySQL, MSSQL) get one INSERT per row instead, so
+    bit_id is always set: the rows of a batch share their date and time and can't be queried back by value.
+    """
+    if connections[router.db_for_write(Bitacora)].features.can_return_rows_from_bulk_insert:
+        return Bitacora.objects.bulk_create(bitacoras, batch_size=BITACORA_BATCH_SIZE)
+    for bitacora in bitacoras:
+        bitacora.save(force_insert=True)
+    return bitacoras
+
+
+def _write_buffered(rows: List[Dict[str, Any]]) -> None:
+    """Insert a batch of buffered rows in one transaction."""
+    bitacoras = [bitacora_from_message(row) for row in rows]
+    with transaction.atomic():
+        _publish_created(_insert_bitacoras(bitacoras))
+
+
+# Write-behind buffer used by queue_bitacora when GRAPHQL_BITACORA_WRITE_BEHIND is set
+bitacora_buffer = (
+    WriteBehindBuffer(
+        _write_buffered,
+        spill_dir=WRITE_BEHIND_SPILL_DIR,
+        max_size=WRITE_BEHIND_MAX_SIZE,
+        batch_size=WRITE_BEHIND_BATCH_SIZE,
+        interval=WRITE_BEHIND_INTERVAL,
+        block_timeout=WRITE_BEHIND_BLOCK_TIMEOUT,
+        fsync=WRITE_BEHIND_FSYNC,
+    )
+    if WRITE_BEHIND_ENABLED
+    else None
+)
+
 
 class BitacoraService:
-    def get_bitacora_list(self, filter: BitacoraFilterInput) -> List[Bitacora]:
-        # Get all objects from the model
-        queryset = Bitacora.objects.all()
+    def get_bitacora_queryset(self, filter: BitacoraFilterInput):
         # Filter the objects based on the input parameters
-        if filter.bit_id:
-            queryset = queryset.filter(bit_id=filter.bit_id)
-        if filter.par_idparameter:
-            queryset = queryset.filter(par_idparameter=filter.par_idparameter)
-        if filter.bit_adm_idpersona:
-            queryset = queryset.filter(bit_adm_idpersona=filter.bit_adm_idpersona)
-        if filter.bit_adm_almacen:
-            queryset = queryset.filter(bit_adm_almacen=filter.bit_adm_almacen)
-        if filter.bit_observaciones:
-            queryset = queryset.filter(bit_observaciones__icontains=filter.bit_observaciones)
-        if filter.bit_cveusu:
-            queryset = queryset.filter(bit_cveusu=filter.bit_cveusu)
-        if filter.bit_fechaope:
-            queryset = queryset.filter(bit_fechaope=filter.bit_fechaope)
+        queryset = Bitacora.objects.filter(compile_filter(filter, lookups=BITACORA_LOOKUPS))
+        if filter.search:
+            # Full text search, results come ranked best match first
+            queryset = search_bitacora(queryset, filter.search)
+        return queryset
+
+    def get_bitacora_list(self, filter: BitacoraFilterInput) -> List[Bitacora]:
+        queryset = self.get_bitacora_queryset(filter)
         offset = (filter.page - 1) * filter.per_page
         # Return the paginated results
         return queryset[offset : offset + filter.per_page]
 
-    def create_bitacora(self, data: BitacoraCreateInput) -> Bitacora:
-        bitacora = Bitacora(
+    def get_bitacora_page(
+        self, filter: BitacoraFilterInput, after: Optional[str] = None
+    ) -> Tuple[List[Bitacora], bool]:
+        """Get the rows after the after cursor in keyset order and whether more rows follow.
+
+        The keyset order replaces the search ranking, a cursor can only point into a stable order.
+        """
+        queryset = self.get_bitacora_queryset(filter).order_by(*keyset_order(BITACORA_KEYSET))
+        if after:
+            # Seek straight to the cursor position instead of scanning and discarding an offset
+            queryset = queryset.filter(keyset_filter(BITACORA_KEYSET, decode_cursor(after)))
+        # Fetch one extra row to know if there is a next page
+        rows = list(queryset[: filter.per_page + 1])
+        return rows[: filter.per_page], len(rows) > filter.per_page
+
+    def _build_bitacora(self, data: BitacoraCreateInput, now: datetime.datetime) -> Bitacora:
+        return Bitacora(
             par_idparameter=data.par_idparameter,
             bit_adm_idpersona=data.bit_adm_idpersona,
             bit_adm_almacen=data.bit_adm_almacen,
             bit_observaciones=data.bit_observaciones,
             bit_cveusu=data.bit_cveusu,
-            bit_fechaope=datetime.datetime.now().date(),
-            bit_horaope=datetime.datetime.now().time(),
+            bit_fechaope=now.date(),
+            bit_horaope=now.time(),
         )
+
+    def create_bitacora(self, data: BitacoraCreateInput) -> Bitacora:
+        bitacora = self._build_bitacora(data, datetime.datetime.now())
         bitacora.save()
+        _publish_created([bitacora])
         return bitacora
 
+    def queue_bitacora(self, data: BitacoraCreateInput) -> bool:
+        """Queue a row for the write-behind buffer, True if queued and False if it had to be written now."""
+        if bitacora_buffer is None:
+            self.create_bitacora(data)
+            return False
+        # Written later in a batch, so there is no bit_id to return yet
+        bitacora_buffer.put(bitacora_message(self._build_bitacora(data, datetime.datetime.now())))
+        return True
+
+    def create_bitacora_batch(self, data: List[BitacoraCreateInput]) -> List[Bitacora]:
+        # Stamp the whole batch with the same operation date and time
+        now = datetime.datetime.now()
+        bitacoras = [self._build_bitacora(item, now) for item in data]
+        # One transaction and a few multi-row INSERTs instead of one INSERT and commit per row
+        with transaction.atomic():
+            created = _insert_bitacoras(bitacoras)
+            _publish_created(created)
+        return created
+
     def update_bitacora(self, bit_id: int, data: BitacoraUpdateInput) -> Bitacora:
         bitacora = Bitacora.objects.get(bit_id=bit_id)
         if data.par_idparameter is not None:
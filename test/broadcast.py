@@ -0,0 +1,130 @@
+import asyncio
+import atexit
+import json
+import logging
+import os
+import socket
+import tempfile
+import threading
+import uuid
+from typing import Any, AsyncIterator, Dict, List, Tuple
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+# Messages a slow subscriber may have pending before the oldest ones are dropped
+SUBSCRIBER_QUEUE_SIZE = getattr(settings, "GRAPHQL_SUBSCRIBER_QUEUE_SIZE", 100)
+# Dotted path of the backend class, e.g. "<app>.broadcast.SocketBroadcaster" to fan out across workers
+BROADCAST_BACKEND = getattr(settings, "GRAPHQL_BROADCAST_BACKEND", None)
+# Directory where every worker binds its datagram socket, for SocketBroadcaster
+BROADCAST_SOCKET_DIR = getattr(
+    settings, "GRAPHQL_BROADCAST_SOCKET_DIR", os.path.join(tempfile.gettempdir(), "graphql-broadcast")
+)
+# Largest message SocketBroadcaster sends or receives
+MAX_MESSAGE_SIZE = 64 * 1024
+
+
+class Broadcaster:
+    """In-process publish/subscribe of JSON-serializable messages by channel.
+
+    publish() may be called from any thread (sync resolvers run on a pool), every subscriber gets the message
+    on its own event loop.
+    """
+
+    def __init__(self) -> None:
+        self._subscribers: Dict[str, List[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]]] = {}
+        self._lock = threading.Lock()
+
+    def publish(self, channel: str, message: Any) -> None:
+        self._deliver(channel, message)
+
+    def _deliver(self, channel: str, message: Any) -> None:
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(self._put, queue, message)
+            except RuntimeError:
+                # The subscriber loop is closed, its generator cleans up on its own
+                pass
+
+    @staticmethod
+    def _put(queue: asyncio.Queue, message: Any) -> None:
+        if queue.full():
+            # A subscriber that can't keep up loses the oldest messages instead of growing without bound
+            queue.get_nowait()
+        queue.put_nowait(message)
+
+    async def subscribe(self, channel: str) -> AsyncIterator[Any]:
+        """Yield the messages published on channel from now on, until the consumer stops iterating."""
+        subscriber = (asyncio.get_running_loop(), asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE))
+        with self._lock:
+            self._subscribers.setdefault(channel, []).append(subscriber)
+        try:
+            while True:
+                yield await subscriber[1].get()
+        finally:
+            with self._lock:
+                self._subscribers[channel].remove(subscriber)
+                if not self._subscribers[channel]:
+                    del self._subscribers[channel]
+
+
+class SocketBroadcaster(Broadcaster):
+    """Broadcaster that fans messages out to every worker of the host through Unix datagram sockets.
+
+    Each worker binds a socket in BROADCAST_SOCKET_DIR and a daemon thread delivers what it receives; publish()
+    sends the message to every socket in the directory, its own included.
+    """
+
+    def __init__(self, directory: str = BROADCAST_SOCKET_DIR) -> None:
+        super().__init__()
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, f"{os.getpid()}-{uuid.uuid4().hex}.sock")
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._socket.bind(self.path)
+        atexit.register(self._unlink)
+        threading.Thread(target=self._receive, name="graphql-broadcast", daemon=True).start()
+
+    def publish(self, channel: str, message: Any) -> None:
+        payload = json.dumps({"channel": channel, "message": message}, default=str).encode()
+        if len(payload) > MAX_MESSAGE_SIZE:
+            raise ValueError(f"Mensaje de {len(payload)} bytes, el máximo es {MAX_MESSAGE_SIZE}.")
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sender:
+            # A worker that stopped reading must not block the publisher, the message is dropped for it instead
+            sender.setblocking(False)
+            for name in os.listdir(self.directory):
+                path = os.path.join(self.directory, name)
+                try:
+                    sender.sendto(payload, path)
+                except (ConnectionRefusedError, FileNotFoundError):
+                    # Socket left behind by a worker that is gone
+                    if path != self.path:
+                        try:
+                            os.unlink(path)
+                        except FileNotFoundError:
+                            pass
+                except OSError as e:
+                    logger.warning("Broadcast to %s failed: %s", path, e)
+
+    def _unlink(self) -> None:
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+    def _receive(self) -> None:
+        while True:
+            payload = self._socket.recv(MAX_MESSAGE_SIZE)
+            try:
+                data = json.loads(payload)
+            except ValueError:
+                logger.warning("Discarded malformed broadcast message")
+                continue
+            self._deliver(data["channel"], data["message"])
+
+
+broadcaster = import_string(BROADCAST_BACKEND)() if BROADCAST_BACKEND else Broadcaster()
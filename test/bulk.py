@@ -0,0 +1,78 @@
+import dataclasses
+import functools
+import operator
+from typing import Dict, List, Sequence, Tuple
+
+from django.db import connections, router, transaction
+from django.db.models import Q
+
+
+def _attnames(model) -> Dict[str, str]:
+    """Map field names to column attribute names ("par_idstatus" -> "par_idstatus_id")."""
+    return {field.name: field.attname for field in model._meta.concrete_fields}
+
+
+def model_rows(model, inputs) -> List:
+    """Build unsaved model instances from strawberry inputs, mapping foreign key ids to their attname."""
+    attnames = _attnames(model)
+    return [model(**{attnames.get(key, key): value for key, value in vars(data).items()}) for data in inputs]
+
+
+def input_fields(model, input_type, key_fields: Sequence[str]) -> List[str]:
+    """Get the columns an input type writes, besides the natural key, so an upsert leaves the others alone."""
+    attnames = _attnames(model)
+    return [attnames[field.name] for field in dataclasses.fields(input_type) if field.name not in key_fields]
+
+
+def _key(row, key_fields: Sequence[str]) -> Tuple:
+    """Get the natural key of a row."""
+    return tuple(getattr(row, field) for field in key_fields)
+
+
+def _key_condition(rows: List, key_fields: Sequence[str]) -> Q:
+    """Build a "(a = x AND b = y) OR ..." condition matching the natural keys of rows."""
+    return functools.reduce(operator.or_, (Q(**dict(zip(key_fields, _key(row, key_fields)))) for row in rows))
+
+
+def upsert_rows(model, rows: List, key_fields: Sequence[str], update_fields: Sequence[str]) -> List:
+    """Insert or update rows by natural key with a single INSERT ... ON CONFLICT DO UPDATE.
+
+    key_fields must be backed by a unique constraint. Backends without ON CONFLICT targets (MySQL, Oracle) fall
+    back to one read, one bulk_create and one bulk_update.
+    """
+    if not rows:
+        return []
+    alias = router.db_for_write(model)
+    manager = model._default_manager.db_manager(alias)
+    if connections[alias].features.supports_update_conflicts_with_target:
+        return manager.bulk_create(rows, update_conflicts=True, unique_fields=key_fields, update_fields=update_fields)
+    stored: Dict[Tuple, object] = {
+        _key(row, key_fields): row for row in manager.filter(_key_condition(rows, key_fields))
+    }
+    saved, to_create, to_update = [], [], []
+    for row in rows:
+        current = stored.get(_key(row, key_fields))
+        if current is None:
+            to_create.append(row)
+            saved.append(row)
+            continue
+        for field in update_fields:
+            setattr(current, field, getattr(row, field))
+        to_update.append(current)
+        saved.append(current)
+    with transaction.atomic(using=alias):
+        manager.bulk_create(to_create)
+        if to_update and update_fields:
+            manager.bulk_update(to_update, update_fields)
+    return saved
+
+
+def sync_rows(model, scope: Q, rows: List, key_fields: Sequence[str], update_fields: Sequence[str]) -> List:
+    """Make the rows of model inside scope exactly rows: one delete and one upsert in one transaction."""
+    alias = router.db_for_write(model)
+    stale = model._default_manager.db_manager(alias).filter(scope)
+    if rows:
+        stale = stale.exclude(_key_condition(rows, key_fields))
+    with transaction.atomic(using=alias):
+        stale.delete()
+        return upsert_rows(model, rows, key_fields, update_fields)
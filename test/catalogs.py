@@ -0,0 +1,162 @@
+import copy
+import dataclasses
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, List
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+from .parameters import VersionNotifier, parameters_changed
+
+# Small, rarely changing lookup tables served from memory
+CATALOG_MODELS = frozenset({"CppStatus", "CppIdenpara", "CppModulos", "CppDepto", "CppPuesto", "CppEmpresa"})
+# Entries kept per worker process before the least recently used are evicted
+CATALOG_CACHE_SIZE = getattr(settings, "GRAPHQL_CATALOG_CACHE_SIZE", 2048)
+# Seconds an entry lives, bounds staleness for writes that don't send signals (update(), raw SQL)
+CATALOG_CACHE_TIMEOUT = getattr(settings, "GRAPHQL_CATALOG_CACHE_TIMEOUT", 300)
+# File replaced on every catalog write so the other workers drop their entries, see VersionNotifier
+CATALOG_VERSION_FILE = getattr(
+    settings, "GRAPHQL_CATALOG_VERSION_FILE", os.path.join(tempfile.gettempdir(), "graphql-catalogs.version")
+)
+
+
+def is_catalog(model) -> bool:
+    """Check if a model is one of the cached catalogs."""
+    return model.__name__ in CATALOG_MODELS
+
+
+class CatalogCache:
+    """Read-through, size bounded LRU with TTL, invalidated per model.
+
+    Invalidation bumps the model generation, which is part of every key, so stale entries are never read again
+    and age out of the LRU on their own. Writes in other processes are seen through the notifier, which drops
+    every entry.
+    """
+
+    def __init__(self, max_size: int, timeout: float, notifier: VersionNotifier) -> None:
+        self.max_size = max_size
+        self.timeout = timeout
+        self.notifier = notifier
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._generations: Dict[str, int] = {}
+        self._version = notifier.current()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _sync(self):
+        """Drop every entry if a catalog was written since, must be called holding the lock."""
+        version = self.notifier.current()
+        if version != self._version:
+            self._entries.clear()
+            self._version = version
+        return version
+
+    def _lookup(self, key: Hashable):
+        """Get (found, value) for a full key, must be called holding the lock."""
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            self.misses += 1
+            return False, None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return True, entry[1]
+
+    def _store(self, label: str, generation: int, version, key: Hashable, value: Any) -> None:
+        """Store a value loaded under generation and version, must be called holding the lock."""
+        # A write happened while loading, the value may already be stale
+        if self._generations.get(label, 0) != generation or self._sync() != version:
+            return
+        self._entries[key] = (time.monotonic() + self.timeout, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def get_or_load(self, model, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """Get the value cached for model and key, calling loader on a miss."""
+        label = model._meta.label
+        with self._lock:
+            version = self._sync()
+            generation = self._generations.get(label, 0)
+            found, value = self._lookup((label, generation, key))
+        if found:
+            return value
+        value = loader()
+        with self._lock:
+            self._store(label, generation, version, (label, generation, key), value)
+        return value
+
+    def get_many(
+        self, model, field_name: str, keys: Iterable[Any], loader: Callable[[List[Any]], Dict[Any, Any]]
+    ) -> Dict[Any, Any]:
+        """Get the rows of model by field_name, calling loader once with every missing key."""
+        label = model._meta.label
+        rows, missing = {}, []
+        with self._lock:
+            version = self._sync()
+            generation = self._generations.get(label, 0)
+            for key in keys:
+                found, value = self._lookup((label, generation, field_name, key))
+                if found:
+                    rows[key] = value
+                else:
+                    missing.append(key)
+        if missing:
+            loaded = loader(missing)
+            with self._lock:
+                for key, value in loaded.items():
+                    self._store(label, generation, version, (label, generation, field_name, key), value)
+            rows.update(loaded)
+        # Cached rows are shared by every request of the worker, hand out copies
+        return {key: copy.copy(row) for key, row in rows.items()}
+
+    def invalidate(self, model) -> None:
+        """Forget every entry of model."""
+        label = model._meta.label
+        with self._lock:
+            self._generations[label] = self._generations.get(label, 0) + 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+catalog_notifier = VersionNotifier(CATALOG_VERSION_FILE)
+catalog_cache = CatalogCache(CATALOG_CACHE_SIZE, CATALOG_CACHE_TIMEOUT, catalog_notifier)
+
+
+def catalog_ids(model, **lookup) -> List[Any]:
+    """Get the primary keys of the catalog rows matching lookup (e.g. cast_cvstatus="A")."""
+    key = ("ids",) + tuple(sorted(lookup.items()))
+    return catalog_cache.get_or_load(
+        model, key, lambda: list(model._default_manager.filter(**lookup).values_list("pk", flat=True))
+    )
+
+
+def catalog_page(model, filter, load: Callable[[], Iterable[Any]], shape: Hashable = ()) -> List[Any]:
+    """Get one page of a catalog listing (load() evaluated on a miss), keyed by every filter value.
+
+    shape tells apart pages loaded with different select_related()/only(), see optimizer.optimization_key. Every
+    call gets its own copies of the rows.
+    """
+    key = ("page", type(filter).__name__, json.dumps(dataclasses.asdict(filter), sort_keys=True, default=str), shape)
+    return [copy.copy(row) for row in catalog_cache.get_or_load(model, key, lambda: list(load()))]
+
+
+def _invalidate_catalog(sender, **kwargs) -> None:
+    if is_catalog(sender):
+        catalog_cache.invalidate(sender)
+        # The other workers only learn about it once the write is visible to them
+        transaction.on_commit(catalog_notifier.bump, using=kwargs.get("using"))
+        # Parameter pages filtered through catalog keys (filters.CATALOG_FIELDS) change with the catalog
+        parameters_changed(using=kwargs.get("using"))
+
+
+post_save.connect(_invalidate_catalog, dispatch_uid="catalogs_invalidate_on_save")
+post_delete.connect(_invalidate_catalog, dispatch_uid="catalogs_invalidate_on_delete")
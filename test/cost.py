@@ -0,0 +1,168 @@
+from typing import Any, Dict, Optional
+
+from django.conf import settings
+from graphql import (
+    FieldNode,
+    FragmentSpreadNode,
+    GraphQLError,
+    GraphQLList,
+    InlineFragmentNode,
+    IntValueNode,
+    ObjectValueNode,
+    VariableNode,
+    get_named_type,
+    get_nullable_type,
+    is_composite_type,
+)
+from graphql.utilities import get_operation_ast
+from strawberry.extensions import SchemaExtension
+
+# Highest cost (resolved fields, list sizes multiplied through the nesting) a single operation may have
+MAX_QUERY_COST = getattr(settings, "GRAPHQL_MAX_QUERY_COST", 5000)
+# Ceiling applied to every filter.per_page
+MAX_PER_PAGE = getattr(settings, "GRAPHQL_MAX_PER_PAGE", 100)
+# Assumed size of lists without a per_page, the default per_page of the filter inputs
+DEFAULT_LIST_SIZE = getattr(settings, "GRAPHQL_DEFAULT_LIST_SIZE", 10)
+
+
+def _argument_value(node, variables: Dict[str, Any]):
+    """Get the value of a literal or variable argument node, None when it can't be known statically."""
+    if isinstance(node, VariableNode):
+        return variables.get(node.name.value)
+    if isinstance(node, IntValueNode):
+        return int(node.value)
+    if isinstance(node, ObjectValueNode):
+        return {field.name.value: _argument_value(field.value, variables) for field in node.fields}
+    return None
+
+
+def _clamp_per_page(per_page: int) -> int:
+    """Keep per_page between 1 and MAX_PER_PAGE, a negative page must not cancel out the cost of other fields."""
+    return max(1, min(per_page, MAX_PER_PAGE))
+
+
+def _page_size(field: FieldNode, variables: Dict[str, Any]) -> Optional[int]:
+    """Get the per_page a field asks for through its filter argument, capped to MAX_PER_PAGE."""
+    for argument in field.arguments:
+        if argument.name.value != "filter":
+            continue
+        value = _argument_value(argument.value, variables)
+        per_page = value.get("perPage") if isinstance(value, dict) else None
+        if isinstance(per_page, int):
+            return _clamp_per_page(per_page)
+        return DEFAULT_LIST_SIZE
+    return None
+
+
+class _CostCalculator:
+    """Walk an operation counting every field resolution, lists multiply the cost of what they contain."""
+
+    def __init__(self, schema, fragments, variables: Dict[str, Any]) -> None:
+        self.schema = schema
+        self.fragments = fragments
+        self.variables = variables
+        # Fragments being walked, the document is not validated yet and a fragment may spread itself
+        self.visiting = set()
+
+    def fragment_type(self, fragment, parent_type):
+        """Type the fields of a fragment are selected on, the parent type when it has no type condition."""
+        if fragment.type_condition is None:
+            return parent_type
+        return self.schema.get_type(fragment.type_condition.name.value) or parent_type
+
+    def selection_set_cost(self, selection_set, parent_type, multiplier: int, page_size: Optional[int]) -> int:
+        cost = 0
+        for selection in selection_set.selections:
+            if isinstance(selection, FieldNode):
+                cost += self.field_cost(selection, parent_type, multiplier, page_size)
+            elif isinstance(selection, InlineFragmentNode):
+                fragment_type = self.fragment_type(selection, parent_type)
+                cost += self.selection_set_cost(selection.selection_set, fragment_type, multiplier, page_size)
+            elif isinstance(selection, FragmentSpreadNode):
+                name = selection.name.value
+                fragment = self.fragments.get(name)
+                # Cycles are left to the NoFragmentCycles validation rule
+                if fragment is None or name in self.visiting:
+                    continue
+                self.visiting.add(name)
+                try:
+                    fragment_type = self.fragment_type(fragment, parent_type)
+                    cost += self.selection_set_cost(fragment.selection_set, fragment_type, multiplier, page_size)
+                finally:
+                    self.visiting.discard(name)
+        return cost
+
+    def field_cost(self, field: FieldNode, parent_type, multiplier: int, page_size: Optional[int]) -> int:
+        fields = getattr(parent_type, "fields", None)
+        # Introspection and unknown fields (validation reports those) cost nothing here
+        if fields is None or field.name.value not in fields:
+            return 0
+        field_type = get_nullable_type(fields[field.name.value].type)
+        # The page size of a filter applies to the list the field returns, directly or inside a connection
+        page_size = _page_size(field, self.variables) or page_size
+        if isinstance(field_type, GraphQLList):
+            multiplier *= page_size or DEFAULT_LIST_SIZE
+            page_size = None
+        named_type = get_named_type(field_type)
+        cost = multiplier
+        if field.selection_set is not None and is_composite_type(named_type):
+            cost += self.selection_set_cost(field.selection_set, named_type, multiplier, page_size)
+        return cost
+
+
+def query_cost(schema, document, operation_name: Optional[str], variables: Optional[Dict[str, Any]]) -> int:
+    """Statically estimate how many field resolutions an operation of document can cause."""
+    operation = get_operation_ast(document, operation_name)
+    if operation is None:
+        return 0
+    root_type = schema.get_root_type(operation.operation)
+    fragments = {
+        definition.name.value: definition
+        for definition in document.definitions
+        if definition.kind == "fragment_definition"
+    }
+    calculator = _CostCalculator(schema, fragments, variables or {})
+    return calculator.selection_set_cost(operation.selection_set, root_type, 1, None)
+
+
+class QueryCostLimiter(SchemaExtension):
+    """Reject operations whose estimated cost exceeds MAX_QUERY_COST before they run, and cap filter.per_page.
+
+    The computed cost is reported in the response extensions. Usage:
+    strawberry.Schema(query=Query, mutation=Mutation, extensions=[QueryCostLimiter])
+    """
+
+    cost: Optional[int] = None
+
+    def on_validate(self):
+        execution_context = self.execution_context
+        if execution_context.graphql_document is not None:
+            self.cost = query_cost(
+                execution_context.schema._schema,
+                execution_context.graphql_document,
+                execution_context.operation_name,
+                execution_context.variables,
+            )
+            if self.cost > MAX_QUERY_COST:
+                # Errors set before validation stop the request before any resolver runs
+                execution_context.errors = [
+                    GraphQLError(
+                        f"La consulta tiene un costo de {self.cost}, el máximo permitido es {MAX_QUERY_COST}.",
+                        extensions={"code": "QUERY_TOO_COSTLY"},
+                    )
+                ]
+        yield
+
+    def resolve(self, _next, root, info, *args, **kwargs):
+        if info.path.prev is None:
+            # The cost above assumed per_page never goes over the ceiling, make it true
+            # Arguments still come as graphql-core dicts keyed by GraphQL names, before strawberry builds the inputs
+            for value in kwargs.values():
+                if isinstance(value, dict) and isinstance(value.get("perPage"), int):
+                    value["perPage"] = _clamp_per_page(value["perPage"])
+        return _next(root, info, *args, **kwargs)
+
+    def get_results(self) -> Dict[str, Any]:
+        if self.cost is None:
+            return {}
+        return {"cost": {"requested": self.cost, "maximum": MAX_QUERY_COST}}
@@ -0,0 +1,84 @@
+import functools
+from typing import Any, Dict, List, Optional
+
+from strawberry.dataloader import DataLoader
+
+from .catalogs import catalog_cache, is_catalog
+from .extensions import resolver_pool
+from .parameters import is_parameter_model, parameter_index
+
+
+def _in_bulk_load_fn(model, field_name: str):
+    """Build a batch function that fetches every requested key of a model in one query."""
+
+    def fetch(keys: List[Any]) -> Dict[Any, Any]:
+        return model._default_manager.in_bulk(keys, field_name=field_name)
+
+    if is_catalog(model):
+        # Catalog rows are served from the process cache, only the missing keys reach the database
+        uncached_fetch = fetch
+
+        def fetch(keys: List[Any]) -> Dict[Any, Any]:
+            return catalog_cache.get_many(model, field_name, keys, uncached_fetch)
+
+    elif is_parameter_model(model):
+        # Parameters come from the versioned per-process index, invalidated by writes in any worker
+        unindexed_fetch = fetch
+
+        def fetch(keys: List[Any]) -> Dict[Any, Any]:
+            return parameter_index.get_many(field_name, keys, unindexed_fetch)
+
+    async def load_fn(keys: List[Any]) -> List[Optional[Any]]:
+        unique_keys = list({key for key in keys if key is not None})
+        # One "WHERE key IN (...)" query per batch instead of one query per row
+        rows = await resolver_pool.run(functools.partial(fetch, unique_keys)) if unique_keys else {}
+        return [rows.get(key) for key in keys]
+
+    return load_fn
+
+
+class Loaders:
+    """Per-request registry of DataLoaders, one per related model."""
+
+    def __init__(self) -> None:
+        self._loaders: Dict[Any, DataLoader] = {}
+
+    def for_model(self, model, field_name: str = "pk") -> DataLoader:
+        """Get (or create) the DataLoader for the given model and lookup field."""
+        loader = self._loaders.get((model, field_name))
+        if loader is None:
+            loader = DataLoader(load_fn=_in_bulk_load_fn(model, field_name))
+            self._loaders[(model, field_name)] = loader
+        return loader
+
+
+def get_loaders(info) -> Loaders:
+    """Get the Loaders attached to the current request context, creating them on first use."""
+    context = info.context
+    if isinstance(context, dict):
+        return context.setdefault("loaders", Loaders())
+    loaders = getattr(context, "loaders", None)
+    if loaders is None:
+        loaders = Loaders()
+        setattr(context, "loaders", loaders)
+    return loaders
+
+
+async def load_related(info, root, field_name: str):
+    """Resolve a ForeignKey of root through the request DataLoader of the related model."""
+    if root is None:
+        return None
+    meta = getattr(root, "_meta", None)
+    if meta is None:
+        # Not a model instance (e.g. a dict or a plain object), nothing to batch
+        return getattr(root, field_name, None)
+    field = meta.get_field(field_name)
+    # Already fetched (select_related or a previous access), no need to hit the database
+    if field.is_cached(root):
+        return field.get_cached_value(root)
+    key = getattr(root, field.attname, None)
+    if key is None:
+        return None
+    target_field = field.target_field
+    field_name = "pk" if target_field.primary_key else target_field.name
+    return await get_loaders(info).for_model(field.related_model, field_name).load(key)
@@ -0,0 +1,196 @@
+import asyncio
+import contextlib
+import contextvars
+import functools
+import itertools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, Iterator, List
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import QuerySet
+from strawberry.extensions import SchemaExtension
+from strawberry.schema.schema_converter import GraphQLCoreConverter
+
+logger = logging.getLogger(__name__)
+
+# Threads available to blocking resolvers in each worker process
+RESOLVER_POOL_SIZE = getattr(settings, "GRAPHQL_RESOLVER_POOL_SIZE", 8)
+# Threads reading chunked querysets (streaming subscriptions, exports) in each worker process
+STREAM_THREADS = getattr(settings, "GRAPHQL_STREAM_THREADS", 4)
+# Minimum seconds between two "pool saturated" log lines
+SATURATION_WARNING_INTERVAL = 10
+
+
+def _release_connections() -> None:
+    """Keep the connections of a long lived pool thread open between calls, dropping the broken ones.
+
+    The threads are few, so they hold their connections like persistent connections do; closing them after each
+    call, as CONN_MAX_AGE = 0 would, meant a connect per resolver. An explicit CONN_MAX_AGE is honoured.
+    """
+    for connection in connections.all(initialized_only=True):
+        if connection.settings_dict["CONN_MAX_AGE"] != 0:
+            connection.close_if_unusable_or_obsolete()
+        elif connection.in_atomic_block or (connection.errors_occurred and not connection.is_usable()):
+            connection.close()
+        else:
+            connection.errors_occurred = False
+
+
+class ResolverPool:
+    """Sized, named thread pool for blocking resolvers, with saturation metrics."""
+
+    def __init__(self, max_workers: int, name: str) -> None:
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.active = 0
+        self.waiting = 0
+        self.peak_active = 0
+        # Calls that found every thread busy and had to wait in the queue
+        self.saturated = 0
+        self._last_warning = float("-inf")
+
+    def _run(self, func: Callable):
+        with self._lock:
+            self.waiting -= 1
+            self.active += 1
+            self.peak_active = max(self.peak_active, self.active)
+        try:
+            return func()
+        finally:
+            _release_connections()
+            with self._lock:
+                self.active -= 1
+
+    async def run(self, func: Callable):
+        """Run func on the pool without blocking the event loop."""
+        with self._lock:
+            self.submitted += 1
+            self.waiting += 1
+            if self.active + self.waiting > self.max_workers:
+                self.saturated += 1
+                now = time.monotonic()
+                if now - self._last_warning >= SATURATION_WARNING_INTERVAL:
+                    self._last_warning = now
+                    logger.warning("Resolver pool saturated: %s", self._stats())
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(self._executor, self._run, functools.partial(context.run, func))
+
+    def _stats(self) -> Dict[str, int]:
+        return {
+            "max_workers": self.max_workers,
+            "submitted": self.submitted,
+            "active": self.active,
+            "waiting": self.waiting,
+            "peak_active": self.peak_active,
+            "saturated": self.saturated,
+        }
+
+    def stats(self) -> Dict[str, int]:
+        """Get a snapshot of the pool metrics."""
+        with self._lock:
+            return self._stats()
+
+
+resolver_pool = ResolverPool(RESOLVER_POOL_SIZE, name="graphql-resolver")
+
+
+class StreamThreads:
+    """Fixed set of single-thread executors, each iteration stays on the least busy one until it ends.
+
+    A queryset iterator keeps its cursor open between chunks, on the connection of the thread that started it, so
+    its chunks can't move between the threads of resolver_pool. Streams sharing a thread interleave their chunks.
+    """
+
+    def __init__(self, size: int, name: str) -> None:
+        self._executors = [
+            ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"{name}-{index}") for index in range(size)
+        ]
+        self._streams = [0] * size
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def acquire(self) -> Iterator[ThreadPoolExecutor]:
+        with self._lock:
+            index = min(range(len(self._streams)), key=self._streams.__getitem__)
+            self._streams[index] += 1
+        try:
+            yield self._executors[index]
+        finally:
+            with self._lock:
+                self._streams[index] -= 1
+
+
+stream_threads = StreamThreads(STREAM_THREADS, name="graphql-stream")
+
+
+def _next_chunk(iterator: Iterator[Any], chunk_size: int) -> List[Any]:
+    try:
+        return list(itertools.islice(iterator, chunk_size))
+    finally:
+        _release_connections()
+
+
+def _close_iterator(iterator: Iterator[Any]) -> None:
+    # Closing a queryset iterator closes its cursor, on the thread that owns the connection
+    close = getattr(iterator, "close", None)
+    if close is not None:
+        close()
+
+
+async def iterate_chunks(iterable: Iterable[Any], chunk_size: int) -> AsyncIterator[List[Any]]:
+    """Yield the items of iterable chunk_size at a time, reading them on one of stream_threads."""
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    iterator = iter(iterable)
+    with stream_threads.acquire() as executor:
+        try:
+            while chunk := await loop.run_in_executor(
+                executor, functools.partial(context.run, _next_chunk, iterator, chunk_size)
+            ):
+                yield chunk
+        finally:
+            executor.submit(_close_iterator, iterator)
+
+
+def _is_blocking_resolver(info) -> bool:
+    """Sync resolvers of root Query/Mutation fields, or of fields marked with metadata={"blocking": True}."""
+    field = info.parent_type.fields[info.field_name].extensions.get(GraphQLCoreConverter.DEFINITION_BACKREF)
+    if field is None or field.base_resolver is None or field.is_async:
+        return False
+    return info.path.prev is None or field.metadata.get("blocking", False)
+
+
+def _in_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+def _resolve_and_evaluate(_next, root, info, *args, **kwargs):
+    result = _next(root, info, *args, **kwargs)
+    # Evaluate lazy querysets here, iterating them later on the event loop would block it
+    if isinstance(result, QuerySet):
+        result = list(result)
+    return result
+
+
+class SyncResolverExecutor(SchemaExtension):
+    """Run sync root resolvers on resolver_pool when the schema executes under an async view.
+
+    Opt-in, no schema registers it by default; the schema served by the async view adds it:
+    strawberry.Schema(query=Query, mutation=Mutation, extensions=[SyncResolverExecutor])
+    """
+
+    def resolve(self, _next, root, info, *args, **kwargs):
+        if not _in_event_loop() or not _is_blocking_resolver(info):
+            return _next(root, info, *args, **kwargs)
+        return resolver_pool.run(functools.partial(_resolve_and_evaluate, _next, root, info, *args, **kwargs))
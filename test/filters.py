@@ -0,0 +1,98 @@
+import functools
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from django.db.models import Q
+
+from .catalogs import catalog_ids
+from .models import CppStatus
+
+# Fields that drive pagination, ordering or search and never become a WHERE condition
+CONTROL_FIELDS = frozenset({"page", "per_page", "order_by", "search"})
+
+# Filter fields that reach a column of a related model
+FIELD_ALIASES = {
+    "par_idstatus_cvstatus": "par_idstatus__cast_cvstatus",
+    "usu_idstatus_cvstatus": "usu_idstatus__cast_cvstatus",
+}
+
+# Exact filters on a catalog column, resolved to the matching keys from the catalog cache instead of a JOIN:
+# field -> (foreign key, catalog model, catalog column)
+CATALOG_FIELDS = {
+    "par_idstatus_cvstatus": ("par_idstatus", CppStatus, "cast_cvstatus"),
+    "usu_idstatus_cvstatus": ("usu_idstatus", CppStatus, "cast_cvstatus"),
+}
+
+# Suffix conventions of the *FilterInput classes: (suffix, ORM lookup, negated)
+SUFFIX_LOOKUPS = (
+    ("__not_in", "in", True),
+    ("__in", "in", False),
+    ("__ne", "exact", True),
+    ("__gte", "gte", False),
+    ("__lte", "lte", False),
+)
+
+# Conditions are emitted cheapest and most selective first so every service builds the same WHERE clause
+LOOKUP_RANK = {"exact": 0, "in": 1}
+NEGATED_RANK = 3
+DEFAULT_RANK = 2
+
+
+class Condition(NamedTuple):
+    """One compiled condition of a filter plan."""
+
+    attr: str
+    lookup: str
+    negated: bool
+    # (catalog model, catalog column) when the value must be translated to catalog keys first
+    catalog: Optional[Tuple] = None
+
+
+def is_set(value) -> bool:
+    """Empty strings and lists sent by forms count as not set, like None."""
+    return value is not None and value != "" and value != []
+
+
+def _compile_condition(attr: str, lookups: Dict[str, str]) -> Tuple[int, Condition]:
+    """Translate a filter attribute into its ORM lookup and rank."""
+    field, lookup, negated = attr, lookups.get(attr, "exact"), False
+    for suffix, suffix_lookup, suffix_negated in SUFFIX_LOOKUPS:
+        if attr.endswith(suffix):
+            field, lookup, negated = attr[: -len(suffix)], suffix_lookup, suffix_negated
+            break
+    if lookup == "exact" and field in CATALOG_FIELDS:
+        foreign_key, model, column = CATALOG_FIELDS[field]
+        rank = NEGATED_RANK if negated else LOOKUP_RANK["in"]
+        return rank, Condition(attr, f"{foreign_key}__in", negated, (model, column))
+    field = FIELD_ALIASES.get(field, field)
+    rank = NEGATED_RANK if negated else LOOKUP_RANK.get(lookup, DEFAULT_RANK)
+    return rank, Condition(attr, f"{field}__{lookup}", negated)
+
+
+@functools.lru_cache(maxsize=1024)
+def _compile_plan(input_class, shape: frozenset, lookups: Tuple[Tuple[str, str], ...]) -> Tuple[Condition, ...]:
+    """Compile the ordered conditions for one shape (set of filled fields) of a filter input."""
+    lookup_map = dict(lookups)
+    compiled = sorted(_compile_condition(attr, lookup_map) for attr in shape)
+    return tuple(condition for _, condition in compiled)
+
+
+def compile_filter(filter, lookups: Optional[Dict[str, str]] = None) -> Q:
+    """Compile a *FilterInput into a single Q expression.
+
+    Every filled field becomes an exact match unless lookups overrides it (e.g. {"name": "icontains"})
+    or its suffix says otherwise (__in, __ne, __not_in, __gte, __lte).
+    """
+    values = vars(filter)
+    shape = frozenset(attr for attr, value in values.items() if attr not in CONTROL_FIELDS and is_set(value))
+    # Nothing but paging set, no plan to look up
+    if not shape:
+        return Q()
+    condition = Q()
+    for attr, lookup, negated, catalog in _compile_plan(type(filter), shape, tuple(sorted((lookups or {}).items()))):
+        value = values[attr]
+        if catalog is not None:
+            model, column = catalog
+            value = catalog_ids(model, **{column: value})
+        q = Q(**{lookup: value})
+        condition &= ~q if negated else q
+    return condition
@@ -0,0 +1,84 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, router, transaction
+
+from ...models import Bitacora
+from ...partitions import (
+    KEYSET_INDEX_SQL,
+    KEYSET_INDEX_VENDORS,
+    PARTITIONS_AHEAD,
+    add_months,
+    convert_table_sql,
+    create_partition_sql,
+    data_months,
+    detach_partition_sql,
+    is_partitioned,
+    month_start,
+    partition_month,
+    partition_names,
+)
+
+
+def _month(value: str) -> datetime.date:
+    try:
+        return datetime.datetime.strptime(value, "%Y-%m").date()
+    except ValueError:
+        raise CommandError(f"Mes inválido {value}, use AAAA-MM.")
+
+
+class Command(BaseCommand):
+    help = (
+        "Keep the Bitacora table partitioned by month (PostgreSQL): create the coming partitions, "
+        "convert the table with --convert and detach old months with --detach-before. Run it monthly."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--convert", action="store_true", help="Convert the existing table, copying its rows.")
+        parser.add_argument("--ahead", type=int, default=PARTITIONS_AHEAD, help="Months to create ahead of time.")
+        parser.add_argument("--detach-before", type=_month, help="Detach the partitions of the months before AAAA-MM.")
+        parser.add_argument("--drop", action="store_true", help="Drop the detached partitions instead of keeping them.")
+
+    def handle(self, *args, **options):
+        alias = router.db_for_write(Bitacora)
+        connection = connections[alias]
+        if connection.vendor != "postgresql":
+            if connection.vendor not in KEYSET_INDEX_VENDORS:
+                self.stdout.write(
+                    self.style.WARNING(
+                        f"No hay particiones en {connection.vendor}, cree a mano el índice de Bitacora por "
+                        f"(bit_fechaope, bit_horaope, bit_id)."
+                    )
+                )
+                return
+            with connection.cursor() as cursor:
+                cursor.execute(KEYSET_INDEX_SQL)
+            self.stdout.write(
+                self.style.WARNING(f"No hay particiones en {connection.vendor}, solo se creó el índice por fecha.")
+            )
+            return
+        with transaction.atomic(using=alias), connection.cursor() as cursor:
+            last_month = add_months(month_start(datetime.date.today()), options["ahead"])
+            if not is_partitioned(cursor):
+                if not options["convert"]:
+                    raise CommandError("La tabla de Bitacora no está particionada, use --convert.")
+                first_month, data_last_month = data_months(cursor)
+                for statement in convert_table_sql(first_month, max(last_month, data_last_month)):
+                    cursor.execute(statement)
+                self.stdout.write(self.style.SUCCESS("Tabla de Bitacora particionada por mes."))
+            else:
+                month = month_start(datetime.date.today())
+                while month <= last_month:
+                    cursor.execute(create_partition_sql(month))
+                    month = add_months(month, 1)
+            if options["detach_before"]:
+                for name in partition_names(cursor):
+                    month = partition_month(name)
+                    if month is None or month >= options["detach_before"]:
+                        continue
+                    # A detached partition is a plain table again, archive it or drop it without touching the rest
+                    cursor.execute(detach_partition_sql(month))
+                    if options["drop"]:
+                        cursor.execute(f"DROP TABLE {name}")
+                    self.stdout.write(f"{'Eliminada' if options['drop'] else 'Separada'} la partición {name}.")
+        self.stdout.write(self.style.SUCCESS(f"Particiones de Bitacora listas hasta {last_month:%Y-%m}."))
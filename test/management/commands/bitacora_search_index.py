@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from django.db import connections, router, transaction
+
+from ...models import Bitacora
+from ...search import search_index_notifier, search_index_sql
+
+
+class Command(BaseCommand):
+    help = "Create (or rebuild) the full text index used by the Bitacora observation search."
+
+    def handle(self, *args, **options):
+        alias = router.db_for_write(Bitacora)
+        connection = connections[alias]
+        statements = search_index_sql(connection.vendor)
+        if not statements:
+            self.stdout.write(self.style.WARNING(f"No hay índice de texto para {connection.vendor}, se usa icontains."))
+            return
+        with transaction.atomic(using=alias), connection.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
+            # Running workers cached that there was no index
+            transaction.on_commit(search_index_notifier.bump, using=alias)
+        self.stdout.write(self.style.SUCCESS(f"Índice de búsqueda de Bitacora listo en {connection.vendor}."))
@@ -0,0 +1,208 @@
+import hashlib
+import json
+import os
+from collections import Counter, defaultdict
+
+from django.apps import apps
+from django.core.exceptions import FieldDoesNotExist
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, migrations, models, router
+from django.db.migrations.autodetector import MigrationAutodetector
+from django.db.migrations.loader import MigrationLoader
+from django.db.migrations.writer import MigrationWriter
+
+from ...filters import CATALOG_FIELDS, FIELD_ALIASES, SUFFIX_LOOKUPS
+from ...query_patterns import QUERY_PATTERNS_FILE
+
+# Lookups a B-tree index serves by equality, they go first in the index
+EQUALITY_LOOKUPS = ("exact", "in")
+# Lookups served by a range scan, at most one of them, after the equality columns
+RANGE_LOOKUPS = ("gte", "lte")
+# Longest index proposed
+MAX_INDEX_COLUMNS = 3
+
+
+def _field_lookup(model, name: str):
+    """Get the model field and lookup a filter field compiles to, None when no single column serves it."""
+    field_name, lookup = name, "exact"
+    for suffix, suffix_lookup, negated in SUFFIX_LOOKUPS:
+        if name.endswith(suffix):
+            if negated:
+                return None
+            field_name, lookup = name[: -len(suffix)], suffix_lookup
+            break
+    if field_name in CATALOG_FIELDS:
+        # Compiled to foreign_key__in over the catalog keys
+        field_name, lookup = CATALOG_FIELDS[field_name][0], "in"
+    elif "__" in FIELD_ALIASES.get(field_name, ""):
+        return None
+    try:
+        field = model._meta.get_field(field_name)
+    except FieldDoesNotExist:
+        return None
+    if not field.concrete or lookup not in EQUALITY_LOOKUPS + RANGE_LOOKUPS:
+        return None
+    return field, lookup
+
+
+def _index_name(model, fields) -> str:
+    """Name within the 30 characters Django allows, unique per model and columns."""
+    digest = hashlib.sha1(":".join([model._meta.db_table, *fields]).encode()).hexdigest()[:8]
+    return f"{model._meta.db_table[:17]}_{digest}_ix"
+
+
+class Command(BaseCommand):
+    help = (
+        "Aggregate the filter shapes recorded by QueryPatternRecorder, EXPLAIN them and propose composite "
+        "indexes as a migration."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--file", default=QUERY_PATTERNS_FILE, help="Recorded patterns (JSON lines).")
+        parser.add_argument("--min-count", type=int, default=5, help="Ignore shapes seen fewer times.")
+        parser.add_argument("--top", type=int, default=10, help="Most indexes to propose.")
+        parser.add_argument("--write", action="store_true", help="Write the migration instead of printing it.")
+
+    def handle(self, *args, **options):
+        if not options["file"] or not os.path.exists(options["file"]):
+            raise CommandError("No hay patrones registrados, configure GRAPHQL_QUERY_PATTERNS_FILE o use --file.")
+        patterns = self._aggregate(options["file"])
+        proposals = {}
+        for (label, fields), stats in sorted(patterns.items(), key=lambda item: -item[1]["sql_ms"]):
+            if stats["count"] < options["min_count"]:
+                continue
+            model = apps.get_model(label)
+            self.stdout.write(
+                f"{label} {list(fields)}: {stats['count']} veces, "
+                f"{stats['sql_ms'] / stats['count']:.1f} ms SQL promedio, {stats['queries'] / stats['count']:.1f} "
+                f"consultas"
+            )
+            columns = self._index_columns(model, fields, patterns)
+            if not columns:
+                continue
+            self._explain(model, columns)
+            field_names = tuple(field.name for field, _ in columns)
+            if not self._indexed(model, field_names):
+                self._propose(proposals, (label, field_names), stats["sql_ms"])
+        chosen = sorted(proposals, key=lambda key: -proposals[key])[: options["top"]]
+        if not chosen:
+            self.stdout.write(self.style.WARNING("Ningún índice nuevo que proponer."))
+            return
+        for app_label in sorted({apps.get_model(label)._meta.app_label for label, _ in chosen}):
+            self._migration(app_label, [key for key in chosen if key[0].startswith(f"{app_label}.")], options["write"])
+
+    def _aggregate(self, path):
+        patterns = defaultdict(lambda: {"count": 0, "sql_ms": 0.0, "queries": 0})
+        with open(path, encoding="utf-8") as patterns_file:
+            for line in patterns_file:
+                try:
+                    pattern = json.loads(line)
+                except ValueError:
+                    # Last line of a worker killed while writing
+                    continue
+                if not pattern.get("model") or not pattern.get("fields"):
+                    continue
+                stats = patterns[pattern["model"], tuple(pattern["fields"])]
+                stats["count"] += 1
+                stats["sql_ms"] += pattern["sql_ms"]
+                stats["queries"] += pattern["queries"]
+        return patterns
+
+    def _index_columns(self, model, fields, patterns):
+        """Equality columns, the ones most shapes of the model share first, then one range column."""
+        usage = Counter()
+        for (label, other_fields), stats in patterns.items():
+            if label == model._meta.label:
+                usage.update({field: stats["count"] for field in other_fields})
+        resolved = [(name, _field_lookup(model, name)) for name in fields]
+        resolved = [(name, field_lookup) for name, field_lookup in resolved if field_lookup is not None]
+        equality = sorted(
+            (item for item in resolved if item[1][1] in EQUALITY_LOOKUPS), key=lambda item: (-usage[item[0]], item[0])
+        )
+        ranges = sorted((item for item in resolved if item[1][1] in RANGE_LOOKUPS), key=lambda item: -usage[item[0]])
+        columns, seen = [], set()
+        for _, (field, lookup) in equality + ranges[:1]:
+            if field.name not in seen:
+                seen.add(field.name)
+                columns.append((field, lookup))
+        return columns[:MAX_INDEX_COLUMNS]
+
+    def _explain(self, model, columns):
+        """Print the current plan of the shape with values taken from an existing row."""
+        attnames = [field.attname for field, _ in columns]
+        sample = (
+            model._default_manager.exclude(**{f"{attname}__isnull": True for attname in attnames})
+            .values_list(*attnames)
+            .first()
+        )
+        if sample is None:
+            self.stdout.write("  sin filas para EXPLAIN")
+            return
+        conditions = {}
+        for (field, lookup), value in zip(columns, sample):
+            conditions[f"{field.attname}__{lookup}"] = [value] if lookup == "in" else value
+        plan = model._default_manager.filter(**conditions).explain()
+        self.stdout.write("  " + plan.replace("\n", "\n  "))
+
+    def _indexed(self, model, field_names) -> bool:
+        """Whether an existing index starts with these columns."""
+        columns = [model._meta.get_field(name).column for name in field_names]
+        connection = connections[router.db_for_read(model)]
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(cursor, model._meta.db_table)
+        return any(
+            (constraint["index"] or constraint["unique"]) and constraint["columns"][: len(columns)] == columns
+            for constraint in constraints.values()
+        )
+
+    def _propose(self, proposals, key, sql_ms: float) -> None:
+        """Add an index weighted by the SQL time it may save, merged with the proposals that share its prefix."""
+        label, field_names = key
+        for other_label, other in list(proposals):
+            if other_label != label:
+                continue
+            if other[: len(field_names)] == field_names:
+                proposals[label, other] += sql_ms
+                return
+            if field_names[: len(other)] == other:
+                # The longer index serves the shorter shape too
+                proposals[key] = proposals.pop((label, other)) + sql_ms
+                return
+        proposals[key] = sql_ms
+
+    def _migration(self, app_label, keys, write: bool):
+        operations = []
+        for label, field_names in keys:
+            model = apps.get_model(label)
+            name = _index_name(model, field_names)
+            if model._meta.managed:
+                operations.append(
+                    migrations.AddIndex(
+                        model_name=model._meta.model_name, index=models.Index(fields=list(field_names), name=name)
+                    )
+                )
+            else:
+                # Migrations skip unmanaged models, their indexes go as plain SQL
+                columns = ", ".join(model._meta.get_field(field_name).column for field_name in field_names)
+                operations.append(
+                    migrations.RunSQL(
+                        f"CREATE INDEX {name} ON {model._meta.db_table} ({columns})", f"DROP INDEX {name}"
+                    )
+                )
+        loader = MigrationLoader(None, ignore_no_migrations=True)
+        leaves = loader.graph.leaf_nodes(app_label)
+        number = max((MigrationAutodetector.parse_number(leaf[1]) or 0 for leaf in leaves), default=0) + 1
+        migration = migrations.Migration(f"{number:04d}_query_pattern_indexes", app_label)
+        migration.dependencies = leaves
+        migration.operations = operations
+        writer = MigrationWriter(migration)
+        if not write:
+            self.stdout.write(writer.as_string())
+            return
+        os.makedirs(writer.basedir, exist_ok=True)
+        init_path = os.path.join(writer.basedir, "__init__.py")
+        if not os.path.exists(init_path):
+            open(init_path, "w").close()
+        with open(writer.path, "w", encoding="utf-8") as migration_file:
+            migration_file.write(writer.as_string())
+        self.stdout.write(self.style.SUCCESS(f"Migración {writer.path} creada."))
@@ -0,0 +1,143 @@
+from typing import Iterable, List, Optional, Sequence, Set, Tuple
+
+from django.db.models import QuerySet
+from django.db.models.query import ModelIterable
+from strawberry.types.nodes import SelectedField, Selection
+from strawberry.utils.str_converters import to_snake_case
+
+from .catalogs import is_catalog
+
+
+def _selected_fields(selections: Iterable[Selection]) -> List[SelectedField]:
+    """Flatten fragments so only the selected fields remain."""
+    fields = []
+    for selection in selections:
+        if isinstance(selection, SelectedField):
+            fields.append(selection)
+        else:
+            fields.extend(_selected_fields(selection.selections))
+    return fields
+
+
+# Resolver fields computed from other columns, mapped to the columns they read
+COMPUTED_FIELD_DEPENDENCIES = {
+    "usu_usuarionombre": ("usu_nousuari", "usu_apusuari", "usu_amusuari"),
+    "vendedor": ("per_nomrazon", "per_paterno", "per_materno", "per_idpersona"),
+}
+
+
+def _relation_fields(model) -> dict:
+    """Map field name to relation field (forward and reverse) for a model."""
+    return {
+        field.name: field for field in model._meta.get_fields() if field.is_relation and field.related_model is not None
+    }
+
+
+def _concrete_fields(model) -> dict:
+    """Map field name and "<fk>_id" alias to the concrete field that stores it."""
+    fields = {}
+    for field in model._meta.concrete_fields:
+        fields[field.name] = field
+        if field.is_relation:
+            fields[f"{field.name}_id"] = field
+    return fields
+
+
+def _projected_fields(model, selections: Iterable[Selection]) -> Optional[Set[str]]:
+    """Get the columns needed by the selected fields, or None when some field can't be mapped."""
+    concrete = _concrete_fields(model)
+    only = {model._meta.pk.name}
+    for selection in _selected_fields(selections):
+        name = to_snake_case(selection.name)
+        if name == "__typename":
+            continue
+        if name in concrete:
+            only.add(concrete[name].name)
+        elif name in COMPUTED_FIELD_DEPENDENCIES:
+            only.update(dep for dep in COMPUTED_FIELD_DEPENDENCIES[name] if dep in concrete)
+        else:
+            # Unknown resolver, it may read any column so keep them all
+            return None
+    return only
+
+
+def _collect_relations(
+    model,
+    selections: Iterable[Selection],
+    prefix: str,
+    select: Set[str],
+    prefetch: Set[str],
+    only: Set[str],
+    prefetched: bool = False,
+    project: bool = True,
+) -> None:
+    """Walk the selection set and collect the join paths and columns that the client asked for."""
+    # Columns can only be pruned along a select_related chain where every level is prunable
+    projected = _projected_fields(model, selections) if project and not prefetched else None
+    if projected is not None:
+        only.update(f"{prefix}{name}" for name in projected)
+    relations = _relation_fields(model)
+    for selection in _selected_fields(selections):
+        field = relations.get(to_snake_case(selection.name))
+        # Scalars and "*_id" fields never need a join
+        if field is None or not selection.selections:
+            continue
+        path = f"{prefix}{field.name}"
+        single_valued = (field.many_to_one or field.one_to_one) and not prefetched
+        if single_valued and is_catalog(field.related_model):
+            # Catalog rows come from the process cache through the loaders, a JOIN would only add work
+            continue
+        if single_valued:
+            select.add(path)
+        else:
+            prefetch.add(path)
+        _collect_relations(
+            field.related_model,
+            selection.selections,
+            f"{path}__",
+            select,
+            prefetch,
+            only,
+            prefetched=not single_valued,
+            project=projected is not None,
+        )
+
+
+def _descend(fields: List[SelectedField], path: Sequence[str]) -> List[SelectedField]:
+    """Follow path (e.g. edges -> node) down from the selected fields."""
+    for name in path:
+        fields = [child for field in fields for child in _selected_fields(field.selections) if child.name == name]
+    return fields
+
+
+def _plan(model, info, path: Sequence[str]) -> Tuple[Set[str], Set[str], Set[str]]:
+    """Get the select_related paths, prefetch_related paths and only() columns for the fields selected in info."""
+    select: Set[str] = set()
+    prefetch: Set[str] = set()
+    only: Set[str] = set()
+    for selection in _descend(_selected_fields(info.selected_fields), path):
+        _collect_relations(model, selection.selections, "", select, prefetch, only)
+    return select, prefetch, only
+
+
+def optimization_key(model, info, path: Sequence[str] = ()) -> Tuple:
+    """Get what optimize() applies for info as a hashable value, for caches that store optimized rows."""
+    return tuple(tuple(sorted(part)) for part in _plan(model, info, path))
+
+
+def optimize(queryset, info, path: Sequence[str] = ()):
+    """Apply select_related/prefetch_related and only() to queryset for the fields selected in info.
+
+    path points at the object type inside a wrapper, e.g. ("edges", "node") for connections.
+    """
+    # Lists, values() querysets and anything else are returned untouched
+    if not isinstance(queryset, QuerySet) or queryset._iterable_class is not ModelIterable:
+        return queryset
+    select, prefetch, only = _plan(queryset.model, info, path)
+    if select:
+        queryset = queryset.select_related(*sorted(select))
+    if prefetch:
+        queryset = queryset.prefetch_related(*sorted(prefetch))
+    if only:
+        queryset = queryset.only(*sorted(only))
+    return queryset
@@ -0,0 +1,211 @@
+import base64
+import binascii
+import dataclasses
+import functools
+import hashlib
+import json
+from typing import Any, AsyncIterator, Callable, List, Optional, Sequence
+
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, router
+from django.db.models import F, Q, QuerySet
+
+from .extensions import iterate_chunks
+from .optimizer import optimize
+from .types import Connection, Edge, PageInfoType
+
+# Seconds a total count stays cached for the same filter signature
+COUNT_CACHE_TIMEOUT = getattr(settings, "GRAPHQL_COUNT_CACHE_TIMEOUT", 30)
+# Models whose unfiltered total count is read from the database statistics instead of COUNT(*)
+ESTIMATED_COUNT_MODELS = getattr(settings, "GRAPHQL_ESTIMATED_COUNT_MODELS", ("Bitacora", "PerPersonasPm"))
+# Filter fields that only move the window and never change the total
+WINDOW_FIELDS = ("page", "per_page", "order_by")
+# Rows per chunk delivered by the stream subscriptions
+STREAM_CHUNK_SIZE = getattr(settings, "GRAPHQL_STREAM_CHUNK_SIZE", 50)
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Encode the values of a row position into an opaque cursor."""
+    payload = [value.isoformat() if hasattr(value, "isoformat") else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(payload, default=str).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> List[Any]:
+    """Decode an opaque cursor into the values it was built from."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, binascii.Error) as e:
+        raise ValueError(f"Cursor {cursor} no es válido.") from e
+    if not isinstance(values, list):
+        raise ValueError(f"Cursor {cursor} no es válido.")
+    return values
+
+
+def keyset_cursor(row, fields: Sequence[str]) -> str:
+    """Build the cursor of a row for a keyset ordering."""
+    return encode_cursor([getattr(row, field) for field in fields])
+
+
+def keyset_order(fields: Sequence[str]) -> List[Any]:
+    """Ascending ordering for a keyset, NULLs last on every backend so it matches keyset_filter."""
+    return [F(field).asc(nulls_last=True) for field in fields]
+
+
+def _equal(field: str, value) -> Q:
+    return Q(**{f"{field}__isnull": True}) if value is None else Q(**{field: value})
+
+
+def keyset_filter(fields: Sequence[str], values: Sequence[Any]) -> Q:
+    """Build the "rows after (values)" condition for the keyset_order ordering."""
+    if len(fields) != len(values):
+        raise ValueError("El cursor no corresponde al ordenamiento.")
+    condition = Q()
+    # (a, b, c) > (x, y, z)  <=>  a > x OR (a = x AND b > y) OR (a = x AND b = y AND c > z),
+    # where NULL sorts after every value and equals NULL
+    for index, field in enumerate(fields):
+        if values[index] is None:
+            # Nothing sorts after NULL
+            continue
+        equal = Q()
+        for prior, value in zip(fields[:index], values[:index]):
+            equal &= _equal(prior, value)
+        condition |= equal & (Q(**{f"{field}__gt": values[index]}) | Q(**{f"{field}__isnull": True}))
+    if not condition:
+        # Cursor of the very last position
+        return Q(pk__in=[])
+    # Redundant with the condition above, but a plain bound on the leading column lets the planner seek the index
+    # (and skip older partitions) instead of evaluating the ORs row by row
+    leading = _equal(fields[0], None)
+    if values[0] is not None:
+        leading |= Q(**{f"{fields[0]}__gte": values[0]})
+    return condition & leading
+
+
+def build_keyset_connection(
+    rows: List[Any],
+    has_next_page: bool,
+    after,
+    fields: Sequence[str],
+    count_resolver: Optional[Callable[[], int]] = None,
+) -> Connection:
+    """Wrap a keyset page into a Connection with one cursor per edge."""
+    edges = [Edge(node=row, cursor=keyset_cursor(row, fields)) for row in rows]
+    return Connection(
+        edges=edges,
+        page_info=PageInfoType(
+            has_next_page=has_next_page,
+            has_previous_page=after is not None,
+            start_cursor=edges[0].cursor if edges else None,
+            end_cursor=edges[-1].cursor if edges else None,
+        ),
+        count_resolver=count_resolver,
+    )
+
+
+def filter_signature(filter) -> str:
+    """Hash the filter values that change the matching rows, ignoring the page window."""
+    values = {key: value for key, value in dataclasses.asdict(filter).items() if key not in WINDOW_FIELDS}
+    payload = json.dumps(values, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+def _is_unfiltered(filter) -> bool:
+    """Check if no filter field besides the page window is set."""
+    return all(value is None for key, value in dataclasses.asdict(filter).items() if key not in WINDOW_FIELDS)
+
+
+def estimate_count(model) -> Optional[int]:
+    """Read the approximate row count of a table from the database statistics."""
+    connection = connections[router.db_for_read(model)]
+    table = model._meta.db_table
+    if connection.vendor == "postgresql":
+        sql = "SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(%s)"
+    elif connection.vendor == "microsoft":
+        sql = "SELECT SUM(rows) FROM sys.partitions WHERE object_id = OBJECT_ID(%s) AND index_id IN (0, 1)"
+    else:
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [table])
+        row = cursor.fetchone()
+    # reltuples is -1 (or NULL) until the table has been analyzed
+    if row is None or row[0] is None or row[0] < 0:
+        return None
+    return int(row[0])
+
+
+def get_total_count(queryset, filter) -> int:
+    """Count the rows of queryset, cached per filter signature for COUNT_CACHE_TIMEOUT seconds."""
+    model = queryset.model
+    key = f"graphql:count:{model._meta.label}:{filter_signature(filter)}"
+    count = cache.get(key)
+    if count is None:
+        if model.__name__ in ESTIMATED_COUNT_MODELS and _is_unfiltered(filter):
+            count = estimate_count(model)
+        if count is None:
+            count = queryset.count()
+        cache.set(key, count, COUNT_CACHE_TIMEOUT)
+    return count
+
+
+def unsliced(queryset):
+    """Drop the page slice taken by a service so the caller can choose its own window.
+
+    Anything but a QuerySet (a page the service already materialized) is returned as is.
+    """
+    if not isinstance(queryset, QuerySet):
+        return queryset
+    queryset = queryset.all()
+    queryset.query.clear_limits()
+    return queryset
+
+
+async def stream_chunks(result, chunk_size: int = STREAM_CHUNK_SIZE) -> AsyncIterator[List[Any]]:
+    """Yield the rows of a list or queryset chunk_size at a time, reading a queryset chunk by chunk off the event loop."""
+    rows = result.iterator(chunk_size=chunk_size) if isinstance(result, QuerySet) else iter(result)
+    async for chunk in iterate_chunks(rows, chunk_size):
+        yield chunk
+
+
+def _decode_position(cursor: str) -> int:
+    """Decode a position cursor built by build_offset_connection."""
+    values = decode_cursor(cursor)
+    if len(values) != 1 or not isinstance(values[0], int) or values[0] < 0:
+        raise ValueError(f"Cursor {cursor} no es válido.")
+    return values[0]
+
+
+def build_offset_connection(result, filter, info, after: Optional[str] = None) -> Connection:
+    """Wrap a paginated service result into a Connection with position cursors and totalCount.
+
+    after, when given, takes precedence over filter.page. Services that return an already materialized page
+    sliced it by filter.page, after must then point at the row right before that page.
+    """
+    page_offset = (filter.page - 1) * filter.per_page
+    offset = _decode_position(after) + 1 if after else page_offset
+    if not isinstance(result, QuerySet) and offset != page_offset:
+        raise ValueError(f"Cursor {after} no corresponde a la página {filter.page}, use filter.page.")
+    if isinstance(result, QuerySet):
+        queryset = optimize(unsliced(result), info, path=("edges", "node"))
+        # Fetch one extra row to know if there is a next page
+        rows = list(queryset[offset : offset + filter.per_page + 1])
+        has_next_page = len(rows) > filter.per_page
+        rows = rows[: filter.per_page]
+        count_resolver = functools.partial(get_total_count, unsliced(result), filter)
+    else:
+        # Already materialized page, the best we can tell is whether it was full
+        rows = list(result)
+        has_next_page = len(rows) == filter.per_page
+        count_resolver = None
+    edges = [Edge(node=row, cursor=encode_cursor([offset + index])) for index, row in enumerate(rows)]
+    return Connection(
+        edges=edges,
+        page_info=PageInfoType(
+            has_next_page=has_next_page,
+            has_previous_page=offset > 0,
+            start_cursor=edges[0].cursor if edges else None,
+            end_cursor=edges[-1].cursor if edges else None,
+        ),
+        count_resolver=count_resolver,
+    )
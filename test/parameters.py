@@ -0,0 +1,157 @@
+import copy
+import dataclasses
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+# File every worker of the host watches, replaced on each PncParametrPm write. Workers on other hosts need it on
+# a shared mount.
+PARAMETERS_VERSION_FILE = getattr(
+    settings, "GRAPHQL_PARAMETERS_VERSION_FILE", os.path.join(tempfile.gettempdir(), "graphql-pncparametrpm.version")
+)
+# Rows and pages kept per worker process before the least recently used are evicted
+PARAMETER_INDEX_SIZE = getattr(settings, "GRAPHQL_PARAMETER_INDEX_SIZE", 4096)
+
+
+class VersionNotifier:
+    """Cross-process version counter backed by a file.
+
+    Writers atomically replace the file, readers compare its inode and mtime with the ones they saw last: one
+    stat() per read, and a write is visible to every process as soon as it returns.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+
+    def current(self) -> Optional[Tuple[int, int]]:
+        """Get the current version token, None while nobody has written."""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns
+
+    def bump(self) -> None:
+        """Publish a new version to every process."""
+        directory = os.path.dirname(self.path) or "."
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".version-")
+        try:
+            with os.fdopen(fd, "w") as tmp:
+                tmp.write(f"{time.time_ns()} {os.getpid()}\n")
+            # A new inode on every bump, so two writes within the mtime resolution still differ
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+
+class ParameterIndex:
+    """Per-process index of PncParametrPm rows and listing pages, dropped whenever the shared version changes."""
+
+    def __init__(self, notifier: VersionNotifier, max_size: int) -> None:
+        self.notifier = notifier
+        self.max_size = max_size
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._version = notifier.current()
+        self._lock = threading.Lock()
+
+    def _sync(self):
+        """Drop the index if another process (or this one) wrote since, must be called holding the lock."""
+        version = self.notifier.current()
+        if version != self._version:
+            self._entries.clear()
+            self._version = version
+        return version
+
+    def _store(self, version, entries: Iterable[Tuple[Hashable, Any]]) -> None:
+        """Keep entries read under version, must be called holding the lock."""
+        # Rows read while a write was published may be stale, serve them once but don't keep them
+        if self._sync() != version:
+            return
+        for key, value in entries:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """Get the value indexed under key, calling loader when it is missing."""
+        with self._lock:
+            version = self._sync()
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+        value = loader()
+        with self._lock:
+            self._store(version, [(key, value)])
+        return value
+
+    def get_many(
+        self, field_name: str, keys: List[Any], loader: Callable[[List[Any]], Dict[Any, Any]]
+    ) -> Dict[Any, Any]:
+        """Get the parameters by field_name, calling loader once with every key not indexed yet."""
+        rows, missing = {}, []
+        with self._lock:
+            version = self._sync()
+            for key in keys:
+                row = self._entries.get(("row", field_name, key))
+                if row is None:
+                    missing.append(key)
+                else:
+                    self._entries.move_to_end(("row", field_name, key))
+                    rows[key] = row
+        if missing:
+            loaded = loader(missing)
+            with self._lock:
+                self._store(version, ((("row", field_name, key), row) for key, row in loaded.items()))
+            rows.update(loaded)
+        return rows
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+parameters_notifier = VersionNotifier(PARAMETERS_VERSION_FILE)
+parameter_index = ParameterIndex(parameters_notifier, PARAMETER_INDEX_SIZE)
+
+
+def is_parameter_model(model) -> bool:
+    """Check if a model is the indexed parameters table."""
+    return model.__name__ == "PncParametrPm"
+
+
+def parameter_page(filter, load: Callable[[], Iterable[Any]], shape: Hashable = ()) -> List[Any]:
+    """Get one page of a PncParametrPm listing (load() evaluated on a miss), keyed by every filter value.
+
+    shape tells apart pages loaded with different select_related()/only(), see optimizer.optimization_key. Every
+    call gets its own copies of the rows.
+    """
+    key = ("page", type(filter).__name__, json.dumps(dataclasses.asdict(filter), sort_keys=True, default=str), shape)
+    return [copy.copy(row) for row in parameter_index.get_or_load(key, lambda: list(load()))]
+
+
+def parameters_changed(using: Optional[str] = None) -> None:
+    """Invalidate the parameter index of every worker once the current transaction commits.
+
+    Signals cover save() and delete(), call this after writes that bypass them (update(), bulk_create(), raw SQL).
+    """
+    # Publishing before the commit would let other workers reload the old rows
+    transaction.on_commit(parameters_notifier.bump, using=using)
+
+
+def _invalidate_parameters(sender, **kwargs) -> None:
+    if is_parameter_model(sender):
+        parameters_changed(using=kwargs.get("using"))
+
+
+post_save.connect(_invalidate_parameters, dispatch_uid="parameters_invalidate_on_save")
+post_delete.connect(_invalidate_parameters, dispatch_uid="parameters_invalidate_on_delete")
@@ -0,0 +1,109 @@
+import datetime
+from typing import List, Optional, Tuple
+
+from django.conf import settings
+
+from .models import Bitacora
+from .search import search_index_sql
+
+BITACORA_TABLE = Bitacora._meta.db_table
+# Column the PostgreSQL partitions split by, one partition per month
+PARTITION_COLUMN = "bit_fechaope"
+# Months after the current one that get their partition ahead of time
+PARTITIONS_AHEAD = getattr(settings, "BITACORA_PARTITIONS_AHEAD", 3)
+# Serves the range filters and the keyset ordering, on PostgreSQL it is created on every partition
+KEYSET_INDEX_SQL = (
+    f"CREATE INDEX IF NOT EXISTS {BITACORA_TABLE}_keyset ON {BITACORA_TABLE} ({PARTITION_COLUMN}, bit_horaope, bit_id)"
+)
+# Backends that accept CREATE INDEX IF NOT EXISTS, on the others the index is created by hand
+KEYSET_INDEX_VENDORS = ("postgresql", "sqlite")
+
+
+def month_start(day: datetime.date) -> datetime.date:
+    return day.replace(day=1)
+
+
+def add_months(month: datetime.date, count: int) -> datetime.date:
+    index = month.year * 12 + month.month - 1 + count
+    return datetime.date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: datetime.date) -> str:
+    return f"{BITACORA_TABLE}_{month:%Y%m}"
+
+
+def partition_month(name: str) -> Optional[datetime.date]:
+    """Get the month of a partition from its name, None for the default partition."""
+    try:
+        return datetime.datetime.strptime(name[len(BITACORA_TABLE) + 1 :], "%Y%m").date()
+    except ValueError:
+        return None
+
+
+def create_partition_sql(month: datetime.date) -> str:
+    return (
+        f"CREATE TABLE IF NOT EXISTS {partition_name(month)} PARTITION OF {BITACORA_TABLE} "
+        f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{add_months(month, 1):%Y-%m-%d}')"
+    )
+
+
+def detach_partition_sql(month: datetime.date) -> str:
+    return f"ALTER TABLE {BITACORA_TABLE} DETACH PARTITION {partition_name(month)}"
+
+
+def convert_table_sql(first_month: datetime.date, last_month: datetime.date) -> List[str]:
+    """Get the statements that turn the Bitacora table into a table partitioned by month, keeping its rows.
+
+    PostgreSQL requires the partition column in every unique index, so bit_id is only unique together with
+    bit_fechaope. Rows without a date and dates outside the monthly partitions go to the default one.
+    Meant to run in one transaction, the old table is dropped once its rows are copied.
+    """
+    table, old = BITACORA_TABLE, f"{BITACORA_TABLE}_unpartitioned"
+    statements = [
+        f"ALTER TABLE {table} RENAME TO {old}",
+        f"CREATE TABLE {table} (LIKE {old} INCLUDING DEFAULTS INCLUDING IDENTITY INCLUDING STORAGE) "
+        f"PARTITION BY RANGE ({PARTITION_COLUMN})",
+        f"CREATE UNIQUE INDEX {table}_pk ON {table} (bit_id, {PARTITION_COLUMN})",
+        f"CREATE TABLE IF NOT EXISTS {table}_default PARTITION OF {table} DEFAULT",
+    ]
+    month = first_month
+    while month <= last_month:
+        statements.append(create_partition_sql(month))
+        month = add_months(month, 1)
+    statements += [
+        # A serial bit_id keeps the sequence of the old table as default, which would go with it: hand it over.
+        # Identity columns got a sequence of their own from INCLUDING IDENTITY
+        f"DO $$ DECLARE seq text := pg_get_serial_sequence('{old}', 'bit_id'); BEGIN "
+        f"IF seq IS NOT NULL AND (SELECT attidentity FROM pg_attribute WHERE attrelid = '{old}'::regclass "
+        f"AND attname = 'bit_id') = '' THEN EXECUTE 'ALTER SEQUENCE ' || seq || ' OWNED BY {table}.bit_id'; "
+        f"END IF; END $$",
+        f"INSERT INTO {table} SELECT * FROM {old}",
+        # The identity sequence of the new table starts over, move it past the copied ids
+        f"SELECT setval(pg_get_serial_sequence('{table}', 'bit_id'), COALESCE(MAX(bit_id), 0) + 1, false) FROM {table}",
+        f"DROP TABLE {old}",
+        KEYSET_INDEX_SQL,
+    ]
+    # The search indexes went away with the old table
+    return statements + search_index_sql("postgresql")
+
+
+def is_partitioned(cursor) -> bool:
+    cursor.execute("SELECT 1 FROM pg_partitioned_table WHERE partrelid = %s::regclass", [BITACORA_TABLE])
+    return cursor.fetchone() is not None
+
+
+def partition_names(cursor) -> List[str]:
+    cursor.execute(
+        "SELECT child.relname FROM pg_inherits JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+        "WHERE pg_inherits.inhparent = %s::regclass ORDER BY child.relname",
+        [BITACORA_TABLE],
+    )
+    return [name for (name,) in cursor.fetchall()]
+
+
+def data_months(cursor) -> Tuple[datetime.date, datetime.date]:
+    """Get the first and last month with rows, the current month if the table is empty."""
+    cursor.execute(f"SELECT MIN({PARTITION_COLUMN}), MAX({PARTITION_COLUMN}) FROM {BITACORA_TABLE}")
+    first, last = cursor.fetchone()
+    today = datetime.date.today()
+    return month_start(first or today), month_start(last or today)
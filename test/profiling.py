@@ -0,0 +1,183 @@
+import contextvars
+import inspect
+import logging
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from strawberry.extensions import SchemaExtension
+
+from .extensions import _in_event_loop
+from .sql_timing import sql_field, track_sql
+
+logger = logging.getLogger(__name__)
+
+# Request header that asks for the profile in the response extensions
+PROFILE_HEADER = getattr(settings, "GRAPHQL_PROFILE_HEADER", "X-GraphQL-Profile")
+# Queries one field may trigger across its calls before it is reported as an N+1 hotspot
+N_PLUS_ONE_THRESHOLD = getattr(settings, "GRAPHQL_PROFILE_N_PLUS_ONE_THRESHOLD", 5)
+# Slowest resolvers listed in the profile
+PROFILE_TOP_RESOLVERS = 10
+
+
+class _Profile:
+    """Timings of one operation."""
+
+    def __init__(self) -> None:
+        # "Type.field" -> [calls, seconds]
+        self.fields: Dict[str, list] = {}
+        self.steps: Dict[str, float] = {}
+        self.summary: Optional[Dict[str, Any]] = None
+        self.lock = threading.Lock()
+
+    def record(self, key: str, seconds: float) -> None:
+        with self.lock:
+            entry = self.fields.setdefault(key, [0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+
+
+# Profile of the current operation, Strawberry shares the extension instance that runs resolve() between requests
+_current_profile: contextvars.ContextVar[Optional[_Profile]] = contextvars.ContextVar("profile", default=None)
+
+
+def _ms(seconds: float) -> float:
+    return round(seconds * 1000, 3)
+
+
+def _profile_allowed(request) -> bool:
+    """The header is honoured in DEBUG or for staff users, timings tell too much about the backend otherwise."""
+    return settings.DEBUG or bool(getattr(getattr(request, "user", None), "is_staff", False))
+
+
+async def resolve_profile_access(request) -> None:
+    """Decide before the operation runs whether the request gets its profile.
+
+    request.user is lazy and loading it queries the database, which can't happen on the event loop where async
+    views run the extensions.
+    """
+    if PROFILE_HEADER in request.headers:
+        request.graphql_profile_allowed = await sync_to_async(_profile_allowed)(request)
+
+
+class ProfileAccessMixin:
+    """Resolve the profile access in get_context() of an AsyncGraphQLView, for QueryProfiler.
+
+    Usage: class GraphQLView(ProfileAccessMixin, AsyncGraphQLView): ...
+    """
+
+    async def get_context(self, request, response):
+        await resolve_profile_access(request)
+        return await super().get_context(request, response)
+
+
+def _profile_requested(context) -> bool:
+    request = context.get("request") if isinstance(context, dict) else getattr(context, "request", None)
+    if request is None or PROFILE_HEADER not in request.headers:
+        return False
+    allowed = getattr(request, "graphql_profile_allowed", None)
+    if allowed is None:
+        # Not resolved by ProfileAccessMixin, the user can only be loaded outside the event loop
+        allowed = _profile_allowed(request) if not _in_event_loop() else settings.DEBUG
+    return allowed
+
+
+class QueryProfiler(SchemaExtension):
+    """Time parsing, validation, execution, SQL and every resolver of an operation.
+
+    The summary (and N+1 hotspots: fields whose resolvers triggered N_PLUS_ONE_THRESHOLD queries or more) is
+    always logged; the full profile goes to the response extensions when the request has PROFILE_HEADER.
+    Queries of lazy querysets evaluated after their resolver returned only count in the totals. List it first so
+    it also times the other extensions: strawberry.Schema(query=Query, extensions=[QueryProfiler, ...]); async
+    views need ProfileAccessMixin to honour the header for staff users.
+    """
+
+    def on_operation(self):
+        profile = _Profile()
+        # Not reset on exit, get_results() runs after the operation in the same context
+        _current_profile.set(profile)
+        start = time.perf_counter()
+        with track_sql() as stats:
+            yield
+        profile.summary = summary = self._summary(profile, stats, time.perf_counter() - start)
+        log = logger.warning if summary["hotspots"] else logger.info
+        log(
+            "GraphQL %s: %.1f ms, %s queries in %.1f ms, hotspots %s",
+            self.execution_context.operation_name or "anonymous",
+            summary["total_ms"],
+            stats.queries,
+            summary["sql_ms"],
+            [hotspot["field"] for hotspot in summary["hotspots"]],
+        )
+
+    def _step(self, name: str):
+        profile = _current_profile.get()
+        start = time.perf_counter()
+        yield
+        profile.steps[name] = time.perf_counter() - start
+
+    def on_parse(self):
+        yield from self._step("parse")
+
+    def on_validate(self):
+        yield from self._step("validate")
+
+    def on_execute(self):
+        yield from self._step("execute")
+
+    async def _await(self, profile: _Profile, key: str, awaitable):
+        token = sql_field.set(key)
+        start = time.perf_counter()
+        try:
+            return await awaitable
+        finally:
+            profile.record(key, time.perf_counter() - start)
+            sql_field.reset(token)
+
+    def resolve(self, _next, root, info, *args, **kwargs):
+        profile = _current_profile.get()
+        if profile is None:
+            return _next(root, info, *args, **kwargs)
+        key = f"{info.parent_type.name}.{info.field_name}"
+        token = sql_field.set(key)
+        start = time.perf_counter()
+        try:
+            result = _next(root, info, *args, **kwargs)
+        finally:
+            sql_field.reset(token)
+        if inspect.isawaitable(result):
+            # The resolver runs when awaited, time it (and count its queries) there
+            return self._await(profile, key, result)
+        profile.record(key, time.perf_counter() - start)
+        return result
+
+    def _summary(self, profile: _Profile, stats, total: float) -> Dict[str, Any]:
+        resolvers = sorted(
+            (
+                {"field": key, "calls": calls, "ms": _ms(seconds), "queries": stats.by_field.get(key, 0)}
+                for key, (calls, seconds) in profile.fields.items()
+            ),
+            key=lambda resolver: -resolver["ms"],
+        )
+        return {
+            "total_ms": _ms(total),
+            **{f"{name}_ms": _ms(seconds) for name, seconds in profile.steps.items()},
+            "queries": stats.queries,
+            "sql_ms": _ms(stats.seconds),
+            # Queries run while no resolver was running, e.g. lazy querysets iterated by the executor
+            "unattributed_queries": stats.queries - sum(stats.by_field.values()),
+            "resolvers": resolvers[:PROFILE_TOP_RESOLVERS],
+            "hotspots": [
+                {"field": key, "calls": profile.fields.get(key, (0,))[0], "queries": queries}
+                for key, queries in sorted(stats.by_field.items(), key=lambda item: -item[1])
+                if queries >= N_PLUS_ONE_THRESHOLD
+            ],
+        }
+
+    def get_results(self) -> Dict[str, Any]:
+        profile = _current_profile.get()
+        if profile is None or profile.summary is None or not _profile_requested(self.execution_context.context):
+            return {}
+        return {"profile": profile.summary}
@@ -0,0 +1,101 @@
+import contextvars
+import json
+import random
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from django.conf import settings
+from graphql import GraphQLInputObjectType, get_named_type
+from strawberry.extensions import SchemaExtension
+from strawberry.schema.schema_converter import GraphQLCoreConverter
+
+from .filters import CONTROL_FIELDS, is_set
+from .response_cache import app_models
+from .sql_timing import track_sql
+
+# JSON lines file the filter shapes are appended to, recording is off while it is None
+QUERY_PATTERNS_FILE = getattr(settings, "GRAPHQL_QUERY_PATTERNS_FILE", None)
+# Fraction of the operations recorded
+QUERY_PATTERNS_SAMPLE_RATE = getattr(settings, "GRAPHQL_QUERY_PATTERNS_SAMPLE_RATE", 1.0)
+
+_write_lock = threading.Lock()
+# Filter shapes seen by the current operation. Strawberry shares the extension instance that runs resolve()
+# between requests, so per-request state can't live on it
+_current_shapes: contextvars.ContextVar[Optional[List[Tuple[str, Optional[str], List[str]]]]] = contextvars.ContextVar(
+    "filter_shapes", default=None
+)
+
+
+def filter_shape(info, value: Dict[str, Any]) -> Optional[Tuple[str, Optional[str], List[str]]]:
+    """Get the input class, model label and sorted set fields of the filter argument of a field."""
+    argument = info.parent_type.fields[info.field_name].args.get("filter")
+    input_type = get_named_type(argument.type) if argument is not None else None
+    if not isinstance(input_type, GraphQLInputObjectType):
+        return None
+    definition = input_type.extensions.get(GraphQLCoreConverter.DEFINITION_BACKREF)
+    input_name = definition.origin.__name__ if definition is not None else input_type.name
+    fields = []
+    for name, field_value in value.items():
+        field = input_type.fields.get(name)
+        strawberry_field = field.extensions.get(GraphQLCoreConverter.DEFINITION_BACKREF) if field else None
+        python_name = strawberry_field.python_name if strawberry_field is not None else name
+        if python_name not in CONTROL_FIELDS and is_set(field_value):
+            fields.append(python_name)
+    # PncParametrPmFilterInput -> PncParametrPm, then the object type the field returns
+    model = app_models().get(input_name[: -len("FilterInput")])
+    if model is None:
+        model = app_models().get(get_named_type(info.return_type).name[: -len("Type")])
+    return input_name, model, sorted(fields)
+
+
+def record_patterns(patterns: List[Dict[str, Any]], path: str = None) -> None:
+    path = path or QUERY_PATTERNS_FILE
+    lines = "".join(json.dumps(pattern) + "\n" for pattern in patterns)
+    # One write per operation in append mode, lines of concurrent workers don't interleave
+    with _write_lock, open(path, "a", encoding="utf-8") as patterns_file:
+        patterns_file.write(lines)
+
+
+class QueryPatternRecorder(SchemaExtension):
+    """Append the shape (set fields) of every root filter argument and the SQL time of the operation to
+    QUERY_PATTERNS_FILE, for the query_pattern_advisor command.
+
+    SQL time is measured for the whole operation and shared by the filters it used, usually just one.
+    Usage: strawberry.Schema(query=Query, extensions=[QueryPatternRecorder])
+    """
+
+    def on_execute(self):
+        if not QUERY_PATTERNS_FILE or random.random() >= QUERY_PATTERNS_SAMPLE_RATE:
+            yield
+            return
+        shapes = []
+        token = _current_shapes.set(shapes)
+        try:
+            with track_sql() as stats:
+                yield
+        finally:
+            _current_shapes.reset(token)
+        if shapes:
+            now = time.time()
+            record_patterns(
+                [
+                    {
+                        "input": input_name,
+                        "model": model,
+                        "fields": fields,
+                        "sql_ms": round(stats.seconds * 1000, 3),
+                        "queries": stats.queries,
+                        "at": now,
+                    }
+                    for input_name, model, fields in shapes
+                ]
+            )
+
+    def resolve(self, _next, root, info, *args, **kwargs):
+        shapes = _current_shapes.get()
+        if shapes is not None and info.path.prev is None and isinstance(kwargs.get("filter"), dict):
+            shape = filter_shape(info, kwargs["filter"])
+            if shape is not None:
+                shapes.append(shape)
+        return _next(root, info, *args, **kwargs)
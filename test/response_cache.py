@@ -0,0 +1,277 @@
+import functools
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, Iterable, Optional
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.utils.module_loading import import_string
+from graphql import ExecutionResult, FieldNode, FragmentSpreadNode, InlineFragmentNode, get_named_type, print_ast
+from graphql.utilities import get_operation_ast
+from strawberry.extensions import SchemaExtension
+from strawberry.types.graphql import OperationType
+from strawberry.utils.str_converters import to_camel_case
+
+from .parameters import VersionNotifier
+
+# Seconds a cached response lives, bounds staleness for writes that bypass mutations and signals
+RESPONSE_CACHE_TIMEOUT = getattr(settings, "GRAPHQL_RESPONSE_CACHE_TIMEOUT", 60)
+# Responses kept by the local memory backend of each worker
+RESPONSE_CACHE_SIZE = getattr(settings, "GRAPHQL_RESPONSE_CACHE_SIZE", 1000)
+# Dotted path of the backend class, e.g. "<app>.response_cache.DjangoCacheBackend" to share it between workers
+RESPONSE_CACHE_BACKEND = getattr(settings, "GRAPHQL_RESPONSE_CACHE_BACKEND", None)
+# Django cache alias used by DjangoCacheBackend
+RESPONSE_CACHE_ALIAS = getattr(settings, "GRAPHQL_RESPONSE_CACHE_ALIAS", "default")
+# Directory of the tag version files LocalMemoryBackend shares between the workers of the host
+RESPONSE_CACHE_VERSION_DIR = getattr(
+    settings, "GRAPHQL_RESPONSE_CACHE_VERSION_DIR", os.path.join(tempfile.gettempdir(), "graphql-response-tags")
+)
+# Models behind root fields whose name and response types don't tell them all, e.g. reports joining several
+# tables or mutations writing more than one; other fields are tagged by name
+FIELD_MODELS = {
+    "get_par_admalm_search_perms": ("ParAdmalm", "PerPersonasPm", "PncParametrPm"),
+    "get_per_rolespm_people_by_role": ("PerRolesPm", "PerPersonasPm"),
+    "get_per_rolespm_people_with_roles": ("PerRolesPm", "PerPersonasPm"),
+    "apply_par_admalm_perms": ("ParAdmalm", "PncParametrPm"),
+    "apply_par_admalm_transfer_perms": ("ParAdmalm", "PncParametrPm"),
+    "save_par_objetivos": ("ParObjetivos", "ParObjetivosdet"),
+}
+
+
+class LocalMemoryBackend:
+    """Per-process LRU of responses with TTL, invalidated through per-tag versions.
+
+    Each entry records the versions its tags had when the query started; bumping a tag version turns every entry
+    that saw the old one into a miss, without having to know their keys, and also discards results computed
+    while a mutation was running. A tag version is a VersionNotifier file, so a mutation in one worker
+    invalidates the entries of every worker of the host.
+    """
+
+    def __init__(self, version_dir: str) -> None:
+        os.makedirs(version_dir, exist_ok=True)
+        self.version_dir = version_dir
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _notifier(self, tag: str) -> VersionNotifier:
+        return VersionNotifier(os.path.join(self.version_dir, f"{tag}.version"))
+
+    def versions(self, tags: Iterable[str]) -> Dict[str, Any]:
+        return {tag: self._notifier(tag).current() for tag in tags}
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires, versions, value = entry
+        if expires < time.monotonic() or self.versions(versions) != versions:
+            with self._lock:
+                self._entries.pop(key, None)
+            return None
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any, versions: Dict[str, Any]) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + RESPONSE_CACHE_TIMEOUT, versions, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > RESPONSE_CACHE_SIZE:
+                self._entries.popitem(last=False)
+
+    def invalidate_tags(self, tags: Iterable[str]) -> None:
+        for tag in tags:
+            self._notifier(tag).bump()
+
+
+class DjangoCacheBackend:
+    """Responses in a shared Django cache (Redis, Memcached...), same tag versioning as LocalMemoryBackend."""
+
+    def __init__(self) -> None:
+        self.cache = caches[RESPONSE_CACHE_ALIAS]
+
+    def versions(self, tags: Iterable[str]) -> Dict[str, int]:
+        tag_keys = {f"graphql-response-tag:{tag}": tag for tag in tags}
+        stored = self.cache.get_many(list(tag_keys))
+        return {tag: stored.get(tag_key, 0) for tag_key, tag in tag_keys.items()}
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self.cache.get(f"graphql-response:{key}")
+        if entry is None:
+            return None
+        versions, value = entry
+        if self.versions(versions) != versions:
+            return None
+        return value
+
+    def set(self, key: str, value: Any, versions: Dict[str, int]) -> None:
+        self.cache.set(f"graphql-response:{key}", (versions, value), RESPONSE_CACHE_TIMEOUT)
+
+    def invalidate_tags(self, tags: Iterable[str]) -> None:
+        for tag in tags:
+            tag_key = f"graphql-response-tag:{tag}"
+            # add() is a no-op when the counter exists, incr() then bumps it atomically
+            self.cache.add(tag_key, 0, None)
+            self.cache.incr(tag_key)
+
+
+response_cache = (
+    import_string(RESPONSE_CACHE_BACKEND)()
+    if RESPONSE_CACHE_BACKEND
+    else LocalMemoryBackend(RESPONSE_CACHE_VERSION_DIR)
+)
+
+
+@functools.lru_cache(maxsize=None)
+def app_models() -> Dict[str, str]:
+    """Map model name to label for the models of this app."""
+    app_config = apps.get_containing_app_config(__name__)
+    if app_config is None:
+        return {}
+    return {model.__name__: model._meta.label for model in app_config.get_models()}
+
+
+@functools.lru_cache(maxsize=None)
+def _field_models() -> Dict[str, FrozenSet[str]]:
+    """FIELD_MODELS by GraphQL field name, as labels."""
+    models = app_models()
+    return {
+        to_camel_case(field_name): frozenset(models[name] for name in names if name in models)
+        for field_name, names in FIELD_MODELS.items()
+    }
+
+
+@functools.lru_cache(maxsize=1024)
+def _field_tags(field_name: str) -> FrozenSet[str]:
+    """Tags of the models a root field reads or writes, from FIELD_MODELS or the models it is named after."""
+    tags = _field_models().get(field_name)
+    if tags is not None:
+        return tags
+    compact = field_name.replace("_", "").lower()
+    return frozenset(label for name, label in app_models().items() if name.lower() in compact)
+
+
+def _type_tag(type_name: str) -> Optional[str]:
+    """Tag of the model behind an object type, e.g. PncUsuariosPmType."""
+    return app_models().get(type_name[: -len("Type")]) if type_name.endswith("Type") else None
+
+
+def operation_tags(schema, document, operation_name: Optional[str]) -> FrozenSet[str]:
+    """Tags of every model an operation may read or write: root field names and the object types it selects."""
+    operation = get_operation_ast(document, operation_name)
+    if operation is None:
+        return frozenset()
+    fragments = {
+        definition.name.value: definition
+        for definition in document.definitions
+        if definition.kind == "fragment_definition"
+    }
+    tags = set()
+
+    def walk(selection_set, parent_type, root: bool) -> None:
+        for selection in selection_set.selections:
+            if isinstance(selection, InlineFragmentNode):
+                walk(selection.selection_set, parent_type, root)
+            elif isinstance(selection, FragmentSpreadNode):
+                fragment = fragments.get(selection.name.value)
+                if fragment is not None:
+                    walk(fragment.selection_set, parent_type, root)
+            elif isinstance(selection, FieldNode):
+                field = getattr(parent_type, "fields", {}).get(selection.name.value)
+                if field is None:
+                    continue
+                if root:
+                    tags.update(_field_tags(selection.name.value))
+                named_type = get_named_type(field.type)
+                tag = _type_tag(named_type.name)
+                if tag is not None:
+                    tags.add(tag)
+                if selection.selection_set is not None:
+                    walk(selection.selection_set, named_type, False)
+
+    walk(operation.selection_set, schema.get_root_type(operation.operation), True)
+    return frozenset(tags)
+
+
+def request_scope(context) -> str:
+    """Credentials the response was computed for: the session cookie and the Authorization header.
+
+    Two requests with the same credentials act as the same user, so they may share responses; reading them
+    doesn't load the user, which can't be done on the event loop.
+    """
+    request = context.get("request") if isinstance(context, dict) else getattr(context, "request", None)
+    if request is None:
+        return ""
+    session = request.COOKIES.get(settings.SESSION_COOKIE_NAME, "") if hasattr(request, "COOKIES") else ""
+    authorization = request.headers.get("Authorization", "")
+    return f"{session}:{authorization}" if session or authorization else ""
+
+
+def response_key(document, operation_name: Optional[str], variables: Optional[Dict[str, Any]], scope: str = "") -> str:
+    """Key of a response: the normalized document (formatting and comments don't matter), the variables and the
+    request_scope(), so a user never gets a response computed for another."""
+    payload = json.dumps([print_ast(document), operation_name, variables or {}, scope], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class ResponseCache(SchemaExtension):
+    """Serve repeated queries from response_cache and purge the tags a mutation touches.
+
+    Queries are tagged with the models they read (FIELD_MODELS or root field names, and selected object types).
+    Mutations purge the same tags once they ran, post_save/post_delete purge the tag of the saved model. Usage:
+    strawberry.Schema(query=Query, mutation=Mutation, extensions=[ResponseCache])
+    """
+
+    def on_execute(self):
+        execution_context = self.execution_context
+        operation_type = execution_context.operation_type
+        if operation_type not in (OperationType.QUERY, OperationType.MUTATION):
+            yield
+            return
+        tags = operation_tags(
+            execution_context.schema._schema, execution_context.graphql_document, execution_context.operation_name
+        )
+        if operation_type == OperationType.MUTATION:
+            yield
+            # Also after failed mutations, they may have written part of their work
+            response_cache.invalidate_tags(tags)
+            return
+        key = response_key(
+            execution_context.graphql_document,
+            execution_context.operation_name,
+            execution_context.variables,
+            request_scope(execution_context.context),
+        )
+        data = response_cache.get(key)
+        if data is not None:
+            execution_context.result = ExecutionResult(data=data, errors=None)
+            yield
+            return
+        # Taken before running, a mutation finishing meanwhile makes this result a miss
+        versions = response_cache.versions(tags)
+        yield
+        result = execution_context.result
+        # Only complete answers are reused, errors may be transient
+        if result is not None and not result.errors and result.data is not None and tags:
+            response_cache.set(key, result.data, versions)
+
+
+def _invalidate_model(sender, **kwargs) -> None:
+    label = app_models().get(sender.__name__)
+    if label == sender._meta.label:
+        # Invalidating before the commit would let other workers cache the old rows again
+        transaction.on_commit(lambda: response_cache.invalidate_tags([label]), using=kwargs.get("using"))
+
+
+post_save.connect(_invalidate_model, dispatch_uid="response_cache_invalidate_on_save")
+post_delete.connect(_invalidate_model, dispatch_uid="response_cache_invalidate_on_delete")
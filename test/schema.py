@@ -1,9 +1,26 @@
 import decimal
-from typing import List
+from typing import AsyncGenerator, List, Optional
 
 import strawberry
-
-from .services.bit_bitacora_service import BitacoraService
+from django.db import transaction
+from django.db.models import Q
+
+from .bulk import input_fields, model_rows, sync_rows, upsert_rows
+from .catalogs import catalog_page
+from .extensions import resolver_pool
+from .models import CppIdenpara, CppStatus, ParAdmalm, ParObjetivos, ParObjetivosdet, PncParametrPm
+from .optimizer import optimization_key, optimize
+from .pagination import (
+    STREAM_CHUNK_SIZE,
+    build_keyset_connection,
+    build_offset_connection,
+    get_total_count,
+    stream_chunks,
+    unsliced,
+)
+from .parameters import parameter_page, parameters_changed
+from .broadcast import broadcaster
+from .services.bit_bitacora_service import BITACORA_CREATED, BITACORA_KEYSET, BitacoraService, bitacora_from_message
 from .services.cpp_idenpara_service import CppIdenparaService
 from .services.cpp_status_service import CppStatusService
 from .services.par_admalm_service import ParAdmalmService
@@ -17,8 +34,10 @@ from .services.pnc_usuariospm_service import PncUsuariosPmService
 from .types import (
     BitacoraCreateInput,
     BitacoraFilterInput,
+    BitacoraQueueResponseType,
     BitacoraType,
     BitacoraUpdateInput,
+    Connection,
     CppIdenparaFilterInput,
     CppIdenparaType,
     CppStatusFilterInput,
@@ -69,7 +88,22 @@ class PncParametrPmQuery:
     def get_all_pnc_parametrpm_paginator(self, info, filter: PncParametrPmFilterInput) -> List[PncParametrPmType]:
         """Get all PncParametrPm instances with pagination."""
         pnc_parametrpm_service = PncParametrPmService()
-        return pnc_parametrpm_service.get_pnc_parametrpm_list(filter=filter)
+        # Served from the parameter index of the worker, one entry per filter and selection shape
+        return parameter_page(
+            filter,
+            lambda: optimize(pnc_parametrpm_service.get_pnc_parametrpm_list(filter=filter), info),
+            shape=optimization_key(PncParametrPm, info),
+        )
+
+    @strawberry.field
+    def get_all_pnc_parametrpm_connection(
+        self, info, filter: PncParametrPmFilterInput, after: Optional[str] = None
+    ) -> Connection[PncParametrPmType]:
+        """Get PncParametrPm instances as a connection with cursors and totalCount."""
+        pnc_parametrpm_service = PncParametrPmService()
+        return build_offset_connection(
+            pnc_parametrpm_service.get_pnc_parametrpm_list(filter=filter), filter, info, after=after
+        )
 
 
 # Generate strawberry type "Mutation" from the PncParametrPm model
@@ -79,19 +113,25 @@ class PncParametrPmMutation:
     def create_pnc_parametrpm(self, input: PncParametrPmCreateInput) -> PncParametrPmType:
         """Create a new PncParametrPm instance."""
         pnc_parametrpm_service = PncParametrPmService()
-        return pnc_parametrpm_service.create_pnc_parametrpm(data=input)
+        parametrpm = pnc_parametrpm_service.create_pnc_parametrpm(data=input)
+        # Signals only cover save() and delete(), publish the write whatever the service used
+        parameters_changed()
+        return parametrpm
 
     @strawberry.field
     def update_pnc_parametrpm(self, par_idparameter: int, input: PncParametrPmUpdateInput) -> PncParametrPmType:
         """Update an existing PncParametrPm instance."""
         pnc_parametrpm_service = PncParametrPmService()
-        return pnc_parametrpm_service.update_pnc_parametrpm(par_idparameter=par_idparameter, data=input)
+        parametrpm = pnc_parametrpm_service.update_pnc_parametrpm(par_idparameter=par_idparameter, data=input)
+        parameters_changed()
+        return parametrpm
 
     @strawberry.field
     def delete_pnc_parametrpm(self, par_idparameter: int) -> ParAdmalmDeleteResponseType:
         """Delete a PncParametrPm instance."""
         pnc_parametrpm_service = PncParametrPmService()
         if pnc_parametrpm_service.delete_pnc_parametrpm(par_idparameter=par_idparameter):
+            parameters_changed()
             return ParAdmalmDeleteResponseType(
                 success=True,
                 message=f"Parámetro {par_idparameter} eliminado correctamente.",
@@ -107,7 +147,15 @@ class ParAdmalmQuery:
     @strawberry.field
     def get_all_par_admalm_paginator(self, info, filter: ParAdmalmFilterInput) -> List[ParAdmalmType]:
         par_admalm_service = ParAdmalmService()
-        return par_admalm_service.get_par_admalm_list(filter=filter)
+        return optimize(par_admalm_service.get_par_admalm_list(filter=filter), info)
+
+    @strawberry.field
+    def get_all_par_admalm_connection(
+        self, info, filter: ParAdmalmFilterInput, after: Optional[str] = None
+    ) -> Connection[ParAdmalmType]:
+        """Get ParAdmalm instances as a connection with cursors and totalCount."""
+        par_admalm_service = ParAdmalmService()
+        return build_offset_connection(par_admalm_service.get_par_admalm_list(filter=filter), filter, info, after=after)
 
     @strawberry.field
     def get_par_admalm_search_perms(
@@ -153,8 +201,31 @@ class ParAdmalmMutation:
 
     @strawberry.field
     def apply_par_admalm_perms(self, input: ParAdmalmApplyAlmPermsInput) -> ParAdmalmApplyAlmPermsResponseType:
-        par_admalm_service = ParAdmalmService()
-        return par_admalm_service.apply_par_admalm_perms(input=input)
+        # Replace the person's permissions on the warehouse and their parameters set-wise: one delete and one
+        # upsert per table, all or nothing
+        with transaction.atomic():
+            adm_key = ("adm_idpersona", "adm_almacen", "adm_tmov")
+            par_adm_list = sync_rows(
+                ParAdmalm,
+                Q(adm_idpersona=input.adm_idpersona, adm_almacen=input.adm_almacen),
+                model_rows(ParAdmalm, input.par_adm_list or []),
+                key_fields=adm_key,
+                update_fields=input_fields(ParAdmalm, ParAdmalmCreateInput, adm_key),
+            )
+            parameter_key = ("par_tipopara", "par_descrip1", "par_descrip2")
+            parameter_scope = Q(par_tipopara=input.par_tipopara, par_descrip1=input.par_descrip1)
+            sync_rows(
+                PncParametrPm,
+                parameter_scope,
+                model_rows(PncParametrPm, input.pnc_parametr_list or []),
+                key_fields=parameter_key,
+                update_fields=input_fields(PncParametrPm, PncParametrPmCreateInput, parameter_key),
+            )
+            # bulk_create leaves the ids of updated rows unset, read them back in one query
+            pnc_parametr_list = list(PncParametrPm.objects.filter(parameter_scope))
+            # Bulk writes do not send signals
+            parameters_changed()
+        return ParAdmalmApplyAlmPermsResponseType(par_adm_list=par_adm_list, pnc_parametr_list=pnc_parametr_list)
 
     @strawberry.field
     def apply_par_admalm_transfer_perms(self, input: ParAdmalmApplyTransferPermsInput) -> List[ParAdmalmType]:
@@ -169,7 +240,17 @@ class ParObjetivosQuery:
     # Generate strawberry field "get_all_par_objetivos_paginator" from the model
     def get_all_par_objetivos_paginator(self, info, filter: ParObjetivosFilterInput) -> List[ParObjetivosType]:
         par_objetivos_service = ParObjetivosService()
-        return par_objetivos_service.get_par_objetivos_list(filter=filter)
+        return optimize(par_objetivos_service.get_par_objetivos_list(filter=filter), info)
+
+    @strawberry.field
+    def get_all_par_objetivos_connection(
+        self, info, filter: ParObjetivosFilterInput, after: Optional[str] = None
+    ) -> Connection[ParObjetivosType]:
+        """Get ParObjetivos instances as a connection with cursors and totalCount."""
+        par_objetivos_service = ParObjetivosService()
+        return build_offset_connection(
+            par_objetivos_service.get_par_objetivos_list(filter=filter), filter, info, after=after
+        )
 
 
 # Generate strawberry type "Mutation" from the ParObjetivos model
@@ -214,8 +295,29 @@ class ParObjetivosMutation:
     # Generate strawberry field "save_par_objetivos" from the model
     @strawberry.field
     def save_par_objetivos(self, input: ParObjetivosSaveInput) -> ParObjetivosType:
-        par_objetivos_service = ParObjetivosService()
-        return par_objetivos_service.save_par_objetivos(input=input)
+        header_key = ("obm_ano", "obm_vendedor")
+        detail_key = ("obd_ano", "obd_vendedor", "obd_mes")
+        header = ParObjetivos(
+            obm_ano=input.obm_ano,
+            obm_vendedor=input.obm_vendedor,
+            obm_sueldo=input.obm_sueldo,
+            obm_cveusu=input.obm_cveusu,
+        )
+        # One upsert for the header and one for every month, all or nothing
+        with transaction.atomic():
+            upsert_rows(
+                ParObjetivos,
+                [header],
+                key_fields=header_key,
+                update_fields=input_fields(ParObjetivos, ParObjetivosCreateInput, header_key),
+            )
+            header.obd_list = upsert_rows(
+                ParObjetivosdet,
+                model_rows(ParObjetivosdet, input.obd_list or []),
+                key_fields=detail_key,
+                update_fields=input_fields(ParObjetivosdet, ParObjetivosdetCreateInput, detail_key),
+            )
+        return header
 
 
 # Generate strawberry type "Query" from the ParObjetivosdet model
@@ -225,7 +327,17 @@ class ParObjetivosdetQuery:
     # Generate strawberry field "get_all_par_objetivosdet_paginator" from the model
     def get_all_par_objetivosdet_paginator(self, info, filter: ParObjetivosdetFilterInput) -> List[ParObjetivosdetType]:
         par_objetivosdet_service = ParObjetivosdetService()
-        return par_objetivosdet_service.get_par_objetivosdet_list(filter=filter)
+        return optimize(par_objetivosdet_service.get_par_objetivosdet_list(filter=filter), info)
+
+    @strawberry.field
+    def get_all_par_objetivosdet_connection(
+        self, info, filter: ParObjetivosdetFilterInput, after: Optional[str] = None
+    ) -> Connection[ParObjetivosdetType]:
+        """Get ParObjetivosdet instances as a connection with cursors and totalCount."""
+        par_objetivosdet_service = ParObjetivosdetService()
+        return build_offset_connection(
+            par_objetivosdet_service.get_par_objetivosdet_list(filter=filter), filter, info, after=after
+        )
 
 
 # Generate strawberry type "Mutation" from the ParObjetivosdet model
@@ -285,7 +397,45 @@ class BitBitacoraQuery:
         # Get the bitacora service
         bitacora_service = BitacoraService()
         # Return the bitacora list
-        return bitacora_service.get_bitacora_list(filter=filter)
+        return optimize(bitacora_service.get_bitacora_list(filter=filter), info)
+
+    @strawberry.field
+    def get_bitacora_connection(
+        self, info, filter: BitacoraFilterInput, after: Optional[str] = None
+    ) -> Connection[BitacoraType]:
+        """Get Bitacora instances with cursor pagination, use pageInfo.endCursor as the next after.
+
+        Rows always come in keyset order: filter.search only filters them, use getAllBitacoraPaginator for results
+        ranked by relevance.
+        """
+        # Get the bitacora service
+        bitacora_service = BitacoraService()
+        # Return the bitacora page wrapped in a connection
+        rows, has_next_page = bitacora_service.get_bitacora_page(filter=filter, after=after)
+        return build_keyset_connection(
+            rows,
+            has_next_page,
+            after,
+            BITACORA_KEYSET,
+            count_resolver=lambda: get_total_count(bitacora_service.get_bitacora_queryset(filter), filter),
+        )
+
+
+# Generate strawberry type "Subscription" from the Bitacora model
+@strawberry.type
+class BitBitacoraSubscription:
+    @strawberry.subscription
+    async def bitacora_created(
+        self, info, bit_adm_almacen: Optional[str] = None, bit_cveusu: Optional[str] = None
+    ) -> AsyncGenerator[BitacoraType, None]:
+        """Get every Bitacora created from now on, optionally only those of one almacen or user."""
+        async for message in broadcaster.subscribe(BITACORA_CREATED):
+            # Filtered here so clients only receive the events they asked for
+            if bit_adm_almacen is not None and message["bit_adm_almacen"] != bit_adm_almacen:
+                continue
+            if bit_cveusu is not None and message["bit_cveusu"] != bit_cveusu:
+                continue
+            yield bitacora_from_message(message)
 
 
 # Generate strawberry type "Mutation" from the Bitacora model
@@ -299,6 +449,22 @@ class BitBitacoraMutation:
         # Return the bitacora
         return bitacora_service.create_bitacora(data=bitacora_input)
 
+    @strawberry.field
+    def queue_bitacora(self, bitacora_input: BitacoraCreateInput) -> BitacoraQueueResponseType:
+        """Create a Bitacora through the write-behind buffer, without waiting for its INSERT."""
+        bitacora_service = BitacoraService()
+        if bitacora_service.queue_bitacora(data=bitacora_input):
+            return BitacoraQueueResponseType(queued=True, message="Bitacora encolada, se guardará en el próximo lote.")
+        return BitacoraQueueResponseType(queued=False, message="Bitacora guardada.")
+
+    # Generate strawberry field "create_bitacora_batch" from the model
+    @strawberry.field
+    def create_bitacora_batch(self, bitacora_inputs: List[BitacoraCreateInput]) -> List[BitacoraType]:
+        # Get the bitacora service
+        bitacora_service = BitacoraService()
+        # Return the created bitacoras
+        return bitacora_service.create_bitacora_batch(data=bitacora_inputs)
+
     # Generate strawberry field "update_bitacora" from the model
     @strawberry.field
     def update_bitacora(self, bit_id: int, bitacora_input: BitacoraUpdateInput) -> BitacoraType:
@@ -325,7 +491,36 @@ class PerPersonasPmQuery:
     @strawberry.field
     def get_all_per_personaspm_paginator(self, info, filter: PerPersonasPmFilterInput) -> List[PerPersonasPmType]:
         per_personaspm_service = PerPersonasPmService()
-        return per_personaspm_service.get_per_personaspm_list(filter=filter)
+        return optimize(per_personaspm_service.get_per_personaspm_list(filter=filter), info)
+
+    @strawberry.field
+    def get_all_per_personaspm_connection(
+        self, info, filter: PerPersonasPmFilterInput, after: Optional[str] = None
+    ) -> Connection[PerPersonasPmType]:
+        """Get PerPersonasPm instances as a connection with cursors and totalCount."""
+        per_personaspm_service = PerPersonasPmService()
+        return build_offset_connection(
+            per_personaspm_service.get_per_personaspm_list(filter=filter), filter, info, after=after
+        )
+
+
+# Generate strawberry type "Subscription" from the PerPersonasPm model
+@strawberry.type
+class PerPersonasPmSubscription:
+    @strawberry.subscription
+    async def stream_all_per_personaspm(
+        self, info, filter: PerPersonasPmFilterInput, chunk_size: int = STREAM_CHUNK_SIZE
+    ) -> AsyncGenerator[List[PerPersonasPmType], None]:
+        """Get every row matching filter in chunks, each one sent as soon as it is fetched.
+
+        filter.page and filter.per_page are ignored, the whole result is streamed.
+        """
+        per_personaspm_service = PerPersonasPmService()
+        queryset = await resolver_pool.run(
+            lambda: optimize(unsliced(per_personaspm_service.get_per_personaspm_list(filter=filter)), info)
+        )
+        async for chunk in stream_chunks(queryset, max(chunk_size, 1)):
+            yield chunk
 
 
 # Generate strawberry type "Query" from the PncUsuarios model
@@ -334,7 +529,17 @@ class PncUsuariosQuery:
     @strawberry.field
     def get_all_pnc_usuarios_paginator(self, info, filter: PncUsuariosFilterInput) -> List[PncUsuariosType]:
         pnc_usuarios_service = PncUsuariosService()
-        return pnc_usuarios_service.get_pnc_usuarios_list(filter=filter)
+        return optimize(pnc_usuarios_service.get_pnc_usuarios_list(filter=filter), info)
+
+    @strawberry.field
+    def get_all_pnc_usuarios_connection(
+        self, info, filter: PncUsuariosFilterInput, after: Optional[str] = None
+    ) -> Connection[PncUsuariosType]:
+        """Get PncUsuarios instances as a connection with cursors and totalCount."""
+        pnc_usuarios_service = PncUsuariosService()
+        return build_offset_connection(
+            pnc_usuarios_service.get_pnc_usuarios_list(filter=filter), filter, info, after=after
+        )
 
 
 # Generate strawberry type "Query" from the CppStatus model
@@ -343,7 +548,21 @@ class CppStatusQuery:
     @strawberry.field
     def get_all_cpp_status_paginator(self, info, filter: CppStatusFilterInput) -> List[CppStatusType]:
         cpp_status_service = CppStatusService()
-        return cpp_status_service.get_cpp_status_list(filter=filter)
+        # Whole rows come from the catalog cache, nested catalog fields resolve through the cached loaders
+        return catalog_page(
+            CppStatus,
+            filter,
+            lambda: optimize(cpp_status_service.get_cpp_status_list(filter=filter), info),
+            shape=optimization_key(CppStatus, info),
+        )
+
+    @strawberry.field
+    def get_all_cpp_status_connection(
+        self, info, filter: CppStatusFilterInput, after: Optional[str] = None
+    ) -> Connection[CppStatusType]:
+        """Get CppStatus instances as a connection with cursors and totalCount."""
+        cpp_status_service = CppStatusService()
+        return build_offset_connection(cpp_status_service.get_cpp_status_list(filter=filter), filter, info, after=after)
 
 
 # Generate strawberry type "Query" from the PerRolesPm model
@@ -352,7 +571,17 @@ class PerRolesPmQuery:
     @strawberry.field
     def get_all_per_rolespm_paginator(self, info, filter: PerRolesPmFilterInput) -> List[PerRolesPmType]:
         per_rolespm_service = PerRolesPmService()
-        return per_rolespm_service.get_per_rolespm_list(filter=filter)
+        return optimize(per_rolespm_service.get_per_rolespm_list(filter=filter), info)
+
+    @strawberry.field
+    def get_all_per_rolespm_connection(
+        self, info, filter: PerRolesPmFilterInput, after: Optional[str] = None
+    ) -> Connection[PerRolesPmType]:
+        """Get PerRolesPm instances as a connection with cursors and totalCount."""
+        per_rolespm_service = PerRolesPmService()
+        return build_offset_connection(
+            per_rolespm_service.get_per_rolespm_list(filter=filter), filter, info, after=after
+        )
 
     @strawberry.field
     def get_per_rolespm_by_person(self, info, filter: PerRolesPmByPersonFilterInput) -> List[PerRolesPmType]:
@@ -374,13 +603,43 @@ class PerRolesPmQuery:
         return per_rolespm_service.get_per_rolespm_people_by_role(filter=filter)
 
 
+# Generate strawberry type "Subscription" from the PerRolesPm model
+@strawberry.type
+class PerRolesPmSubscription:
+    @strawberry.subscription
+    async def stream_per_rolespm_people_with_roles(
+        self, info, filter: PerRolesPmPeopleWithRolesFilterInput, chunk_size: int = STREAM_CHUNK_SIZE
+    ) -> AsyncGenerator[List[PerRolesPmPeopleWithRolesResponseType], None]:
+        """Get every row of getPerRolespmPeopleWithRoles in chunks, so the first ones render before the rest.
+
+        filter.page and filter.per_page are ignored when the service returns a queryset, the whole result is
+        streamed.
+        """
+        per_rolespm_service = PerRolesPmService()
+        result = await resolver_pool.run(
+            lambda: unsliced(per_rolespm_service.get_per_rolespm_people_with_roles(filter=filter))
+        )
+        async for chunk in stream_chunks(result, max(chunk_size, 1)):
+            yield chunk
+
+
 # Generate strawberry type "Query" from the PncUsuariosPm model
 @strawberry.type
 class PncUsuariosPmQuery:
     @strawberry.field
     def get_all_pnc_usuariospm_paginator(self, info, filter: PncUsuariosPmFilterInput) -> List[PncUsuariosPmType]:
         pnc_usuariospm_service = PncUsuariosPmService()
-        return pnc_usuariospm_service.get_pnc_usuariospm_list(filter=filter)
+        return optimize(pnc_usuariospm_service.get_pnc_usuariospm_list(filter=filter), info)
+
+    @strawberry.field
+    def get_all_pnc_usuariospm_connection(
+        self, info, filter: PncUsuariosPmFilterInput, after: Optional[str] = None
+    ) -> Connection[PncUsuariosPmType]:
+        """Get PncUsuariosPm instances as a connection with cursors and totalCount."""
+        pnc_usuariospm_service = PncUsuariosPmService()
+        return build_offset_connection(
+            pnc_usuariospm_service.get_pnc_usuariospm_list(filter=filter), filter, info, after=after
+        )
 
 
 # Generate strawberry type "Query" from the CppIdenpara model
@@ -389,4 +648,19 @@ class CppIdenparaQuery:
     @strawberry.field
     def get_all_cpp_idenpara_paginator(self, info, filter: CppIdenparaFilterInput) -> List[CppIdenparaType]:
         cpp_idenpara_service = CppIdenparaService()
-        return cpp_idenpara_service.get_cpp_idenpara_list(filter=filter)
+        return catalog_page(
+            CppIdenpara,
+            filter,
+            lambda: optimize(cpp_idenpara_service.get_cpp_idenpara_list(filter=filter), info),
+            shape=optimization_key(CppIdenpara, info),
+        )
+
+    @strawberry.field
+    def get_all_cpp_idenpara_connection(
+        self, info, filter: CppIdenparaFilterInput, after: Optional[str] = None
+    ) -> Connection[CppIdenparaType]:
+        """Get CppIdenpara instances as a connection with cursors and totalCount."""
+        cpp_idenpara_service = CppIdenparaService()
+        return build_offset_connection(
+            cpp_idenpara_service.get_cpp_idenpara_list(filter=filter), filter, info, after=after
+        )
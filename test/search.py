@@ -0,0 +1,112 @@
+import os
+import tempfile
+from typing import List
+
+from django.conf import settings
+from django.db import connections, router
+from django.db.models import BooleanField, FloatField, IntegerField
+from django.db.models.expressions import RawSQL
+
+from .models import Bitacora
+from .parameters import VersionNotifier
+
+# Text search configuration used by the PostgreSQL tsvector index
+SEARCH_CONFIG = getattr(settings, "BITACORA_SEARCH_CONFIG", "spanish")
+
+BITACORA_TABLE = Bitacora._meta.db_table
+# SQLite FTS5 table, an external content index over the Bitacora table kept in sync by triggers
+BITACORA_FTS_TABLE = f"{BITACORA_TABLE}_fts"
+# PostgreSQL expression, the query must use the exact same text for the index to be picked
+BITACORA_TSVECTOR = f"to_tsvector('{SEARCH_CONFIG}'::regconfig, COALESCE(bit_observaciones, ''))"
+# File replaced by the bitacora_search_index command, so running workers look for the new index again
+SEARCH_INDEX_VERSION_FILE = getattr(
+    settings,
+    "BITACORA_SEARCH_INDEX_VERSION_FILE",
+    os.path.join(tempfile.gettempdir(), "graphql-bitacora-search.version"),
+)
+
+search_index_notifier = VersionNotifier(SEARCH_INDEX_VERSION_FILE)
+# Connection alias -> (search index version, FTS5 table exists)
+_fts_available = {}
+
+
+def _connection():
+    return connections[router.db_for_read(Bitacora)]
+
+
+def search_index_sql(vendor: str) -> List[str]:
+    """Get the statements that create (and backfill) the Bitacora search index for a backend."""
+    if vendor == "postgresql":
+        return [
+            "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+            f"CREATE INDEX IF NOT EXISTS {BITACORA_TABLE}_obs_tsv ON {BITACORA_TABLE} USING gin ({BITACORA_TSVECTOR})",
+            # Serves the bit_observaciones__icontains filter, which compares UPPER(column) LIKE UPPER(%s)
+            f"CREATE INDEX IF NOT EXISTS {BITACORA_TABLE}_obs_trgm "
+            f"ON {BITACORA_TABLE} USING gin (UPPER(bit_observaciones) gin_trgm_ops)",
+        ]
+    if vendor == "sqlite":
+        fts, table = BITACORA_FTS_TABLE, BITACORA_TABLE
+        return [
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+            f"bit_observaciones, content='{table}', content_rowid='bit_id', tokenize='unicode61 remove_diacritics 2')",
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN "
+            f"INSERT INTO {fts}(rowid, bit_observaciones) VALUES (new.bit_id, new.bit_observaciones); END",
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN "
+            f"INSERT INTO {fts}({fts}, rowid, bit_observaciones) VALUES ('delete', old.bit_id, old.bit_observaciones); "
+            f"END",
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE ON {table} BEGIN "
+            f"INSERT INTO {fts}({fts}, rowid, bit_observaciones) VALUES ('delete', old.bit_id, old.bit_observaciones); "
+            f"INSERT INTO {fts}(rowid, bit_observaciones) VALUES (new.bit_id, new.bit_observaciones); END",
+            f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+        ]
+    return []
+
+
+def _has_fts_table(connection) -> bool:
+    """Check if the SQLite FTS5 index has been created, once per process and run of bitacora_search_index."""
+    version = search_index_notifier.current()
+    cached = _fts_available.get(connection.alias)
+    if cached is None or cached[0] != version:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [BITACORA_FTS_TABLE])
+            cached = _fts_available[connection.alias] = (version, cursor.fetchone() is not None)
+    return cached[1]
+
+
+def _fts5_query(term: str) -> str:
+    """Quote every word so user input can't use the FTS5 query syntax."""
+    return " ".join('"{}"'.format(word.replace('"', '""')) for word in term.split())
+
+
+def search_bitacora(queryset, term: str):
+    """Filter queryset to the rows whose observations match term, best matches first."""
+    connection = _connection()
+    if connection.vendor == "postgresql":
+        query = f"plainto_tsquery('{SEARCH_CONFIG}'::regconfig, %s)"
+        return (
+            queryset.alias(search_match=RawSQL(f"{BITACORA_TSVECTOR} @@ {query}", [term], BooleanField()))
+            .filter(search_match=True)
+            .annotate(search_rank=RawSQL(f"ts_rank({BITACORA_TSVECTOR}, {query})", [term], FloatField()))
+            .order_by("-search_rank", "bit_id")
+        )
+    if (
+        connection.vendor == "sqlite"
+        and isinstance(Bitacora._meta.pk, IntegerField)
+        and _has_fts_table(connection)
+        and term.split()
+    ):
+        fts, match = BITACORA_FTS_TABLE, _fts5_query(term)
+        return (
+            queryset.filter(bit_id__in=RawSQL(f"SELECT rowid FROM {fts} WHERE {fts} MATCH %s", [match]))
+            .annotate(
+                # FTS5 rank is bm25, lower is better
+                search_rank=RawSQL(
+                    f"(SELECT rank FROM {fts} WHERE {fts} MATCH %s AND rowid = {BITACORA_TABLE}.bit_id)",
+                    [match],
+                    FloatField(),
+                )
+            )
+            .order_by("search_rank", "bit_id")
+        )
+    # No full text index on this backend
+    return queryset.filter(bit_observaciones__icontains=term)
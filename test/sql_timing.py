@@ -0,0 +1,69 @@
+import contextlib
+import contextvars
+import threading
+import time
+from typing import Dict, Iterator, Optional
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+
+class SqlStats:
+    """Queries run and seconds spent in the database while tracked."""
+
+    def __init__(self, parent: Optional["SqlStats"] = None) -> None:
+        # Enclosing tracker, it sees the queries of this one too
+        self.parent = parent
+        self.queries = 0
+        self.seconds = 0.0
+        # Queries by the field whose resolver was running, see sql_field
+        self.by_field: Dict[str, int] = {}
+        # Root resolvers of one request may run on several pool threads at once
+        self.lock = threading.Lock()
+
+
+# Stats of the current request, copied into the resolver pool threads with the rest of the context
+_current_stats: contextvars.ContextVar[Optional[SqlStats]] = contextvars.ContextVar("sql_stats", default=None)
+# Field ("Type.field") the queries run now are counted for, set by whoever times resolvers
+sql_field: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("sql_field", default=None)
+
+
+def _time_query(execute, sql, params, many, context):
+    stats = _current_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - start
+        field = sql_field.get()
+        while stats is not None:
+            with stats.lock:
+                stats.seconds += elapsed
+                stats.queries += 1
+                if field is not None:
+                    stats.by_field[field] = stats.by_field.get(field, 0) + 1
+            stats = stats.parent
+
+
+def _install(connection, **kwargs) -> None:
+    if _time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_time_query)
+
+
+# Connections are per thread, every new one gets the wrapper; it costs a contextvar lookup when nothing is tracked
+connection_created.connect(_install, dispatch_uid="sql_timing")
+for _connection in connections.all(initialized_only=True):
+    _install(_connection)
+
+
+@contextlib.contextmanager
+def track_sql() -> Iterator[SqlStats]:
+    """Count the queries run in this context (and the threads it is copied to) and their time."""
+    stats = SqlStats(_current_stats.get())
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
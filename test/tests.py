@@ -0,0 +1,87 @@
+import dataclasses
+import datetime
+from typing import List, Optional
+from unittest import mock
+
+from django.db.models import Q
+from django.test import SimpleTestCase
+
+from . import filters
+from .filters import _compile_plan, compile_filter
+from .models import CppStatus
+
+
+@dataclasses.dataclass
+class SampleFilterInput:
+    page: Optional[int] = 1
+    per_page: Optional[int] = 10
+    search: Optional[str] = None
+    adm_almacen: Optional[str] = None
+    adm_almacen__in: Optional[List[str]] = None
+    adm_tmov__not_in: Optional[List[str]] = None
+    adm_status__ne: Optional[str] = None
+    bit_fechaope__gte: Optional[datetime.date] = None
+    bit_fechaope__lte: Optional[datetime.date] = None
+    par_idstatus_cvstatus: Optional[str] = None
+    usu_idstatus_cvstatus__ne: Optional[str] = None
+
+
+class CompileFilterTests(SimpleTestCase):
+    def setUp(self):
+        _compile_plan.cache_clear()
+
+    def test_only_control_fields_set(self):
+        self.assertEqual(compile_filter(SampleFilterInput(page=2, per_page=50, search="x")), Q())
+
+    def test_unset_values_are_skipped(self):
+        condition = compile_filter(SampleFilterInput(adm_almacen="", adm_almacen__in=[], adm_status__ne=None))
+        self.assertEqual(condition, Q())
+
+    def test_suffixes(self):
+        day = datetime.date(2026, 1, 1)
+        condition = compile_filter(
+            SampleFilterInput(
+                adm_almacen__in=["A1"],
+                adm_tmov__not_in=["TE"],
+                adm_status__ne="B",
+                bit_fechaope__gte=day,
+                bit_fechaope__lte=day,
+            )
+        )
+        self.assertEqual(
+            condition,
+            Q(adm_almacen__in=["A1"])
+            & Q(bit_fechaope__gte=day)
+            & Q(bit_fechaope__lte=day)
+            & ~Q(adm_status__exact="B")
+            & ~Q(adm_tmov__in=["TE"]),
+        )
+
+    def test_lookup_override(self):
+        condition = compile_filter(SampleFilterInput(adm_almacen="al"), lookups={"adm_almacen": "icontains"})
+        self.assertEqual(condition, Q(adm_almacen__icontains="al"))
+
+    def test_exact_fields_go_first(self):
+        condition = compile_filter(SampleFilterInput(adm_status__ne="B", adm_almacen="A1"))
+        self.assertEqual(condition, Q(adm_almacen__exact="A1") & ~Q(adm_status__exact="B"))
+
+    def test_catalog_alias_uses_catalog_keys(self):
+        with mock.patch.object(filters, "catalog_ids", return_value=[1, 2]) as catalog_ids:
+            condition = compile_filter(SampleFilterInput(par_idstatus_cvstatus="A"))
+        catalog_ids.assert_called_once_with(CppStatus, cast_cvstatus="A")
+        self.assertEqual(condition, Q(par_idstatus__in=[1, 2]))
+
+    def test_negated_catalog_alias(self):
+        with mock.patch.object(filters, "catalog_ids", return_value=[3]):
+            condition = compile_filter(SampleFilterInput(usu_idstatus_cvstatus__ne="B"))
+        self.assertEqual(condition, ~Q(usu_idstatus__in=[3]))
+
+    def test_plan_is_cached_per_shape(self):
+        compile_filter(SampleFilterInput(adm_almacen="A1"))
+        compile_filter(SampleFilterInput(adm_almacen="A2"))
+        self.assertEqual(_compile_plan.cache_info().hits, 1)
+        self.assertEqual(_compile_plan.cache_info().misses, 1)
+
+        compile_filter(SampleFilterInput(adm_almacen="A1", adm_status__ne="B"))
+        compile_filter(SampleFilterInput(adm_almacen="A1"), lookups={"adm_almacen": "icontains"})
+        self.assertEqual(_compile_plan.cache_info().misses, 3)
@@ -1,21 +1,67 @@
 import datetime
 import decimal
 from enum import Enum
-from typing import List, Optional
+from typing import Callable, Generic, List, Optional, TypeVar
 
 import strawberry
 
+from .dataloaders import load_related
+
 
 def id_resolver(obj, field_name: str) -> int:
     """Get ID value from a related object"""
     if obj is None:
         return None
+    # Read the foreign key column directly so the related row is never fetched
+    meta = getattr(obj, "_meta", None)
+    if meta is not None:
+        field = next((f for f in meta.concrete_fields if f.name == field_name), None)
+        if field is not None and field.is_relation and field.target_field.primary_key:
+            return getattr(obj, field.attname)
     value = getattr(obj, field_name, None)
     if hasattr(value, "pk"):
         return value.pk
     return value
 
 
+T = TypeVar("T")
+
+
+### Pagination ###
+@strawberry.type
+class PageInfoType:
+    """Page information for cursor based pagination."""
+
+    has_next_page: bool
+    has_previous_page: bool
+    start_cursor: Optional[str] = None
+    end_cursor: Optional[str] = None
+
+
+@strawberry.type
+class Edge(Generic[T]):
+    """Edge of a cursor based connection."""
+
+    node: T
+    cursor: str
+
+
+@strawberry.type
+class Connection(Generic[T]):
+    """Cursor based connection."""
+
+    edges: List[Edge[T]]
+    page_info: PageInfoType
+    count_resolver: strawberry.Private[Optional[Callable[[], int]]] = None
+
+    @strawberry.field(metadata={"blocking": True})
+    def total_count(self) -> Optional[int]:
+        """Total number of rows matching the filter, only computed when selected."""
+        if self.count_resolver is None:
+            return None
+        return self.count_resolver()
+
+
 ### CppIdenpara ###
 @strawberry.type
 class CppIdenparaType:
@@ -70,9 +116,9 @@ class CppStatusType:
 
     # Add nested type field for self-referencing ForeignKey relationship
     @strawberry.field
-    def cast_idstatu(self) -> "CppStatusType":
+    async def cast_idstatu(self, info: strawberry.Info) -> "CppStatusType":
         """Get related CppStatus object."""
-        return getattr(self, "cast_idstatu", None)
+        return await load_related(info, self, "cast_idstatu")
 
     cast_importe1: decimal.Decimal
     cast_importe2: decimal.Decimal
@@ -113,9 +159,9 @@ class CppDeptoType:
 
     # Add nested type field for ForeignKey relationship
     @strawberry.field
-    def cade_idstatus(self) -> CppStatusType:
+    async def cade_idstatus(self, info: strawberry.Info) -> CppStatusType:
         """Get related CppStatus object."""
-        return getattr(self, "cade_idstatus", None)
+        return await load_related(info, self, "cade_idstatus")
 
     cade_idcveusu: int
     cade_fechope: datetime.datetime
@@ -134,9 +180,9 @@ class CppPuestoType:
 
     # Add nested type field for ForeignKey relationship
     @strawberry.field
-    def capu_idstatus(self) -> CppStatusType:
+    async def capu_idstatus(self, info: strawberry.Info) -> CppStatusType:
         """Get related CppStatus object."""
-        return getattr(self, "capu_idstatus", None)
+        return await load_related(info, self, "capu_idstatus")
 
     capu_idcveusu: int
     capu_fechope: datetime.datetime
@@ -155,9 +201,9 @@ class CppEmpresaType:
 
     # Add nested type field for ForeignKey relationship
     @strawberry.field
-    def caem_idstatus(self) -> CppStatusType:
+    async def caem_idstatus(self, info: strawberry.Info) -> CppStatusType:
         """Get related CppStatus object."""
-        return getattr(self, "caem_idstatus", None)
+        return await load_related(info, self, "caem_idstatus")
 
     caem_idcveusu: int
     caem_fechope: datetime.datetime
@@ -182,29 +228,29 @@ class PncUsuariosPmType:
 
     # Add nested type fields for ForeignKey relationships
     @strawberry.field
-    def usu_iddepto(self) -> CppDeptoType:
+    async def usu_iddepto(self, info: strawberry.Info) -> CppDeptoType:
         """Get related CppDepto object."""
-        return getattr(self, "usu_iddepto", None)
+        return await load_related(info, self, "usu_iddepto")
 
     @strawberry.field
-    def usu_idstatus(self) -> CppStatusType:
+    async def usu_idstatus(self, info: strawberry.Info) -> CppStatusType:
         """Get related CppStatus object."""
-        return getattr(self, "usu_idstatus", None)
+        return await load_related(info, self, "usu_idstatus")
 
     @strawberry.field
-    def usu_idcveusu(self) -> "PncUsuariosPmType":
+    async def usu_idcveusu(self, info: strawberry.Info) -> "PncUsuariosPmType":
         """Get related PncUsuariosPm object (self-reference)."""
-        return getattr(self, "usu_idcveusu", None)
+        return await load_related(info, self, "usu_idcveusu")
 
     @strawberry.field
-    def usu_idpuesto(self) -> CppPuestoType:
+    async def usu_idpuesto(self, info: strawberry.Info) -> CppPuestoType:
         """Get related CppPuesto object."""
-        return getattr(self, "usu_idpuesto", None)
+        return await load_related(info, self, "usu_idpuesto")
 
     @strawberry.field
-    def usu_idempresa(self) -> CppEmpresaType:
+    async def usu_idempresa(self, info: strawberry.Info) -> CppEmpresaType:
         """Get related CppEmpresa object."""
-        return getattr(self, "usu_idempresa", None)
+        return await load_related(info, self, "usu_idempresa")
 
     usu_cveacces: Optional[str] = None
     usu_fechope: Optional[datetime.datetime] = None
@@ -259,24 +305,24 @@ class PncParametrPmType:
 
     # Add nested type fields for ForeignKey relationships
     @strawberry.field
-    def par_idenpara(self) -> CppIdenparaType:
+    async def par_idenpara(self, info: strawberry.Info) -> CppIdenparaType:
         """Get related CppIdenpara object."""
-        return getattr(self, "par_idenpara", None)
+        return await load_related(info, self, "par_idenpara")
 
     @strawberry.field
-    def par_idmodulo(self) -> CppModulosType:
+    async def par_idmodulo(self, info: strawberry.Info) -> CppModulosType:
         """Get related CppModulos object."""
-        return getattr(self, "par_idmodulo", None)
+        return await load_related(info, self, "par_idmodulo")
 
     @strawberry.field
-    def par_idstatus(self) -> CppStatusType:
+    async def par_idstatus(self, info: strawberry.Info) -> CppStatusType:
         """Get related CppStatus object."""
-        return getattr(self, "par_idstatus", None)
+        return await load_related(info, self, "par_idstatus")
 
     @strawberry.field
-    def par_idcveusu(self) -> PncUsuariosPmType:
+    async def par_idcveusu(self, info: strawberry.Info) -> PncUsuariosPmType:
         """Get related PncUsuariosPm object."""
-        return getattr(self, "par_idcveusu", None)
+        return await load_related(info, self, "par_idcveusu")
 
     par_descrip1: str
     par_descrip2: str
@@ -686,6 +732,12 @@ class ParObjetivosType:
     obm_cveusu: Optional[str] = None
     # obm_areavta: Optional[str] = None
 
+    # Add nested list of the monthly details saved together with the goal
+    @strawberry.field
+    def obd_list(self) -> Optional[List[ParObjetivosdetType]]:
+        """Get the ParObjetivosdet objects upserted by save_par_objetivos, without querying them again."""
+        return getattr(self, "obd_list", None)
+
 
 @strawberry.input
 class ParObjetivosFilterInput:
@@ -882,6 +934,14 @@ class BitacoraType:
     bit_horaope: Optional[datetime.time] = None
 
 
+@strawberry.type
+class BitacoraQueueResponseType:
+    """Response type for queueing a Bitacora row in the write-behind buffer."""
+
+    queued: bool
+    message: Optional[str] = None
+
+
 @strawberry.input
 class BitacoraFilterInput:
     """Filter type for Bitacora model."""
@@ -896,6 +956,9 @@ class BitacoraFilterInput:
     bit_observaciones: Optional[str] = None
     bit_cveusu: Optional[str] = None
     bit_fechaope: Optional[datetime.datetime] = None
+    # Operation date range, both ends included; on a partitioned table only the months in range are read
+    bit_fechaope__gte: Optional[datetime.date] = None
+    bit_fechaope__lte: Optional[datetime.date] = None
     bit_horaope: Optional[datetime.time] = None
 
 
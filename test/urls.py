@@ -0,0 +1,19 @@
+"""Streaming exports of the listings, NDJSON or CSV (?format=csv).
+
+Not mounted by the strawberry_django_tut project, which doesn't install this app. A project that does adds it to
+INSTALLED_APPS and includes these routes next to its GraphQL view:
+
+    path("", include("test.urls")),
+
+which serves them at /export/bitacora/ and /export/per_personaspm/, with the same filter arguments as the
+paginator queries.
+"""
+
+from django.urls import path
+
+from .views import export_bitacora, export_per_personaspm
+
+urlpatterns = [
+    path("export/bitacora/", export_bitacora, name="export_bitacora"),
+    path("export/per_personaspm/", export_per_personaspm, name="export_per_personaspm"),
+]
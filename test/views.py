@@ -0,0 +1,129 @@
+import csv
+import dataclasses
+import datetime
+import decimal
+import json
+import typing
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponseBadRequest, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+from strawberry.utils.str_converters import to_camel_case
+
+from .extensions import iterate_chunks
+from .pagination import keyset_order, unsliced
+from .services.bit_bitacora_service import BITACORA_KEYSET, BitacoraService
+from .services.per_personaspm_service import PerPersonasPmService
+from .types import BitacoraFilterInput, PerPersonasPmFilterInput
+
+# Rows fetched from the database per round trip while exporting (server-side cursor where supported)
+EXPORT_CHUNK_SIZE = getattr(settings, "GRAPHQL_EXPORT_CHUNK_SIZE", 2000)
+
+# Parsers of query string values by filter field type
+VALUE_PARSERS = {
+    int: int,
+    float: float,
+    decimal.Decimal: decimal.Decimal,
+    datetime.date: datetime.date.fromisoformat,
+    datetime.datetime: datetime.datetime.fromisoformat,
+    datetime.time: datetime.time.fromisoformat,
+    bool: lambda value: value.lower() in ("1", "true"),
+    str: str,
+}
+
+
+def _parse_value(annotation, value: str):
+    """Parse a query string value to the (Optional, List) type of a filter field."""
+    args = [arg for arg in typing.get_args(annotation) if arg is not type(None)]
+    if typing.get_origin(annotation) is typing.Union and len(args) == 1:
+        return _parse_value(args[0], value)
+    if typing.get_origin(annotation) in (list, typing.List):
+        return [_parse_value(args[0], item) for item in value.split(",")]
+    return VALUE_PARSERS.get(annotation, str)(value)
+
+
+def filter_from_query(input_class, query):
+    """Build a *FilterInput from query string parameters named like its fields (snake_case or GraphQL camelCase)."""
+    hints = typing.get_type_hints(input_class)
+    values = {}
+    for field in dataclasses.fields(input_class):
+        for name in (field.name, to_camel_case(field.name)):
+            if name in query:
+                try:
+                    values[field.name] = _parse_value(hints[field.name], query[name])
+                except (ValueError, decimal.InvalidOperation):
+                    raise ValueError(f"Valor inválido para {name}: {query[name]}")
+                break
+    return input_class(**values)
+
+
+class _Echo:
+    """File-like object whose write() returns the line, so csv.writer can feed a generator."""
+
+    def write(self, value: str) -> str:
+        return value
+
+
+def _encoder(export_format: str, columns):
+    """Get the function that turns one row into a chunk of output, and the header chunk."""
+    if export_format == "csv":
+        writer = csv.writer(_Echo())
+        return writer.writerow, writer.writerow(columns)
+    return lambda row: json.dumps(dict(zip(columns, row)), default=str) + "\n", ""
+
+
+def _export(request, queryset, name: str):
+    """Stream every row of queryset as NDJSON (default) or CSV (?format=csv) with constant memory."""
+    export_format = request.GET.get("format", "ndjson")
+    if export_format not in ("ndjson", "csv"):
+        return HttpResponseBadRequest("Formato no soportado, use ndjson o csv.")
+    columns = [field.attname for field in queryset.model._meta.concrete_fields]
+    rows = queryset.values_list(*columns)
+    encode, header = _encoder(export_format, columns)
+
+    if isinstance(request, ASGIRequest):
+        # Under ASGI a sync iterator would be read whole before sending, fetch each chunk off the event loop instead
+        async def stream():
+            if header:
+                yield header
+            async for chunk in iterate_chunks(rows.iterator(chunk_size=EXPORT_CHUNK_SIZE), EXPORT_CHUNK_SIZE):
+                yield "".join(encode(row) for row in chunk)
+
+    else:
+
+        def stream():
+            if header:
+                yield header
+            for row in rows.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+                yield encode(row)
+
+    content_type = "text/csv" if export_format == "csv" else "application/x-ndjson"
+    response = StreamingHttpResponse(stream(), content_type=content_type)
+    response["Content-Disposition"] = f'attachment; filename="{name}.{export_format}"'
+    return response
+
+
+@require_GET
+def export_bitacora(request):
+    """Export the Bitacora rows matching the same filters as getAllBitacoraPaginator, without the page window."""
+    try:
+        filter = filter_from_query(BitacoraFilterInput, request.GET)
+        queryset = BitacoraService().get_bitacora_queryset(filter)
+    except ValueError as e:
+        return HttpResponseBadRequest(str(e))
+    if not filter.search:
+        # Searches keep their rank order
+        queryset = queryset.order_by(*keyset_order(BITACORA_KEYSET))
+    return _export(request, queryset, "bitacora")
+
+
+@require_GET
+def export_per_personaspm(request):
+    """Export the PerPersonasPm rows matching the same filters as getAllPerPersonaspmPaginator."""
+    try:
+        filter = filter_from_query(PerPersonasPmFilterInput, request.GET)
+        queryset = unsliced(PerPersonasPmService().get_per_personaspm_list(filter=filter))
+    except ValueError as e:
+        return HttpResponseBadRequest(str(e))
+    return _export(request, queryset, "per_personaspm")